@@ -0,0 +1,230 @@
+import argparse
+import os
+import time
+import numpy as np
+from scipy import sparse
+from similarity_engine import TAG_VECTORS_NPZ, TagSimilarityEngine, normalize_rows
+from similarity_store import SIMILARITY_NPY, open_similarity
+
+# Inverted-file (IVF) index over the normalised sparse tag vectors. Movies are
+# clustered with spherical k-means; a query scores the cluster centroids, then
+# computes exact cosine scores only for movies in the `nprobe` closest clusters.
+# Vectors are stored grouped by cluster so each probe is a contiguous CSR slice.
+ANN_INDEX_NPZ = 'ann_index.npz'
+DEFAULT_NPROBE = 8
+# Lists are capped at roughly this many movies so a probe stays cheap on large catalogs
+MAX_LIST_SIZE = 250
+
+def _spherical_kmeans(vectors, n_lists, n_iter, rng):
+    centroids = vectors[rng.choice(vectors.shape[0], n_lists, replace=False)].toarray()
+    for _ in range(n_iter):
+        assignment = _assign(vectors, centroids)
+        sums = (sparse.csr_matrix((np.ones(len(assignment)), (assignment, np.arange(len(assignment)))),
+                                  shape=(n_lists, vectors.shape[0])) @ vectors).toarray()
+        norms = np.linalg.norm(sums, axis=1)
+        empty = norms == 0
+        # Re-seed empty clusters with random movies so every list stays useful
+        if empty.any():
+            sums[empty] = vectors[rng.choice(vectors.shape[0], empty.sum(), replace=False)].toarray()
+            norms[empty] = 1.0
+        centroids = sums / norms[:, None]
+    return centroids
+
+def _assign(vectors, centroids, block_size=8192):
+    assignment = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], block_size):
+        scores = vectors[start:start + block_size] @ centroids.T
+        assignment[start:start + block_size] = np.argmax(scores, axis=1)
+    return assignment
+
+def _concat_ranges(starts, stops):
+    # np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)]) without the Python loop
+    lengths = stops - starts
+    total = lengths.sum()
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    shifts = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return np.arange(total) + shifts
+
+class IVFIndex:
+    def __init__(self, centroids, vectors, items, offsets, nprobe=DEFAULT_NPROBE):
+        # centroids are kept feature-major so a sparse query only touches its own features
+        self.centroids_t = np.ascontiguousarray(centroids.T, dtype=np.float32)
+        self.vectors = sparse.csr_matrix(vectors, dtype=np.float32)
+        self.items = np.asarray(items, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.nprobe = nprobe
+        self.positions = np.empty_like(self.items)
+        self.positions[self.items] = np.arange(len(self.items), dtype=np.int32)
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, n_iter=10, sample_size=None, nprobe=DEFAULT_NPROBE, seed=0):
+        vectors = normalize_rows(vectors)
+        n = vectors.shape[0]
+        n_lists = min(n_lists or max(1, int(np.sqrt(n)), n // MAX_LIST_SIZE), n)
+        rng = np.random.default_rng(seed)
+
+        # Train on a sample (64 movies per list by default), then assign everyone once
+        sample_size = min(sample_size or 64 * n_lists, n)
+        sample = vectors[np.sort(rng.choice(n, sample_size, replace=False))]
+        centroids = _spherical_kmeans(sample, n_lists, n_iter, rng)
+        assignment = _assign(vectors, centroids)
+
+        items = np.argsort(assignment, kind='stable').astype(np.int32)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, vectors[items], items, offsets, nprobe=nprobe)
+
+    def save(self, file_path):
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, centroids_t=self.centroids_t, items=self.items, offsets=self.offsets,
+                     data=self.vectors.data, indices=self.vectors.indices, indptr=self.vectors.indptr,
+                     shape=np.array(self.vectors.shape), nprobe=np.array(self.nprobe))
+        os.replace(tmp_path, file_path)
+        return file_path
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path, allow_pickle=False) as data:
+            vectors = sparse.csr_matrix((data['data'], data['indices'], data['indptr']),
+                                        shape=tuple(data['shape']))
+            return cls(data['centroids_t'].T, vectors, data['items'], data['offsets'], nprobe=int(data['nprobe']))
+
+    def __len__(self):
+        return len(self.items)
+
+    def query(self, vector, k=10, nprobe=None, exclude=None):
+        vector = sparse.csr_matrix(vector, dtype=np.float32)
+        norm = np.sqrt(vector.multiply(vector).sum())
+        if norm == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        return self._search(vector.indices, vector.data / norm, k, nprobe, exclude)
+
+    def query_index(self, index, k=10, nprobe=None):
+        # Neighbors of a catalog movie, excluding the movie itself. The stored row is
+        # already normalised, so it is read straight from the CSR buffers.
+        position = self.positions[index]
+        start, stop = self.vectors.indptr[position], self.vectors.indptr[position + 1]
+        if start == stop:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        return self._search(self.vectors.indices[start:stop], self.vectors.data[start:stop], k, nprobe, index)
+
+    def _search(self, features, weights, k, nprobe, exclude):
+        n_lists = len(self.offsets) - 1
+        nprobe = min(nprobe or self.nprobe, n_lists)
+        centroid_scores = weights @ self.centroids_t[features]
+        probes = np.argpartition(centroid_scores, -nprobe)[-nprobe:] if nprobe < n_lists else np.arange(n_lists)
+
+        dense_query = np.zeros(self.vectors.shape[1], dtype=np.float32)
+        dense_query[features] = weights
+
+        # Each probed list is a contiguous span of the CSR buffers, so its non-zeros are
+        # copied with plain slices and summed per movie with reduceat
+        starts, stops = self.offsets[probes], self.offsets[probes + 1]
+        positions = _concat_ranges(starts, stops)
+        indptr = self.vectors.indptr
+        indices = np.concatenate([self.vectors.indices[indptr[a]:indptr[b]] for a, b in zip(starts, stops)])
+        data = np.concatenate([self.vectors.data[indptr[a]:indptr[b]] for a, b in zip(starts, stops)])
+        products = dense_query[indices] * data
+
+        row_nnz = indptr[positions + 1] - indptr[positions]
+        row_starts = np.zeros(len(positions), dtype=np.int64)
+        np.cumsum(row_nnz[:-1], out=row_starts[1:])
+        if products.size:
+            scores = np.add.reduceat(products, np.minimum(row_starts, products.size - 1))
+            scores[row_nnz == 0] = 0.0
+        else:
+            scores = np.zeros(len(positions), dtype=np.float32)
+        candidates = self.items[positions]
+        if exclude is not None:
+            keep = candidates != exclude
+            candidates, scores = candidates[keep], scores[keep]
+
+        k = min(k, len(candidates))
+        if k == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return candidates[top], scores[top].astype(np.float32)
+
+def recall_report(index, exact, k=10, nprobes=(1, 2, 4, 8, 16, 32), sample_size=500, seed=0):
+    # recall@k of the IVF index against exact cosine rows (dense matrix or TagSimilarityEngine)
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(index), min(sample_size, len(index)), replace=False)
+    truth = []
+    for i in queries:
+        row = np.array(exact[i], dtype=np.float64)
+        row[i] = -np.inf
+        top = np.argpartition(row, -k)[-k:]
+        # Count ties at the k-th score as hits so arbitrary tie order doesn't hurt recall
+        truth.append((set(top.tolist()), row[top].min(), row))
+
+    report = []
+    for nprobe in nprobes:
+        hits = 0
+        start = time.perf_counter()
+        results = [index.query_index(i, k=k, nprobe=nprobe)[0] for i in queries]
+        elapsed = time.perf_counter() - start
+        for found, (expected, threshold, row) in zip(results, truth):
+            hits += sum(1 for j in found if j in expected or row[j] >= threshold)
+        report.append({
+            'nprobe': nprobe,
+            'recall': hits / (k * len(queries)),
+            'latency_ms': 1000 * elapsed / len(queries),
+        })
+    return report
+
+def synthetic_vectors(n, n_features=5000, nnz_per_row=40, n_topics=2000, seed=0):
+    # Clustered random bag-of-words rows for latency benchmarks at catalog sizes we don't have yet
+    rng = np.random.default_rng(seed)
+    topic_features = rng.integers(0, n_features, size=(n_topics, nnz_per_row))
+    topics = rng.integers(0, n_topics, size=n)
+    cols = topic_features[topics]
+    noise = rng.random((n, nnz_per_row)) < 0.3
+    cols[noise] = rng.integers(0, n_features, size=noise.sum())
+    rows = np.repeat(np.arange(n), nnz_per_row)
+    data = rng.integers(1, 4, size=n * nnz_per_row).astype(np.float32)
+    vectors = sparse.csr_matrix((data, (rows, cols.ravel())), shape=(n, n_features))
+    vectors.sum_duplicates()
+    return vectors
+
+def print_report(report, k):
+    print(f"{'nprobe':>8} {'recall@' + str(k):>10} {'latency (ms)':>14}")
+    for row in report:
+        print(f"{row['nprobe']:>8} {row['recall']:>10.3f} {row['latency_ms']:>14.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the IVF index and report recall against exact cosine")
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--n-lists', type=int, default=None)
+    parser.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--synthetic', type=int, default=None,
+                        help="Benchmark on N synthetic items instead of the catalog (recall vs exact scan)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic)
+        exact = TagSimilarityEngine(vectors)
+    else:
+        exact = TagSimilarityEngine.load(os.path.join(args.data_dir, TAG_VECTORS_NPZ))
+        vectors = exact.vectors
+        # Compare against the shipped matrix when it is available, else the exact sparse engine
+        npy_path = os.path.join(args.data_dir, SIMILARITY_NPY)
+        if os.path.exists(npy_path):
+            exact = open_similarity(npy_path)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors, n_lists=args.n_lists, nprobe=args.nprobe)
+    print(f"Built IVF index over {len(index)} items with {len(index.offsets) - 1} lists "
+          f"in {time.perf_counter() - start:.2f}s")
+    print_report(recall_report(index, exact, k=args.k), args.k)
+
+    if not args.synthetic:
+        target_path = os.path.join(args.data_dir, ANN_INDEX_NPZ)
+        index.save(target_path)
+        print(f"Wrote {target_path} ({os.path.getsize(target_path)} bytes)")
+
+if __name__ == "__main__":
+    main()
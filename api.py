@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import parse_qs
+from recommender import RecommenderLoader, open_metadata_cache
+
+# JSON HTTP API over the same Recommender the Streamlit app uses:
+#   GET /recommend?title=Avatar&k=10&genres=Action,Adventure
+#   GET /healthz   GET /stats
+# `application` is a plain WSGI app, so any WSGI server can run it; `python
+# api.py` serves it with gunicorn's pre-fork workers (threads inside each
+# worker overlap the TMDB waits), or with a threaded stdlib server where
+# gunicorn isn't available (e.g. Windows).
+DATA_DIR = os.environ.get('RECOMMENDER_DATA_DIR') or None
+MAX_K = int(os.environ.get('API_MAX_K', 50))
+
+_loader = None
+_loader_lock = threading.Lock()
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+def get_loader():
+    # Created in each worker after the fork, so every worker process has its own
+    # SQLite connection and TMDB event loop; the artifacts load on its warm-up thread
+    global _loader
+    with _loader_lock:
+        if _loader is None:
+            # Load problems are logged once per (re)load, not on every request
+            _loader = RecommenderLoader(DATA_DIR, metadata_cache=open_metadata_cache(warn=log), warn=log)
+        return _loader
+
+def get_recommender():
+    # Waits for the warm-up; None if the data is missing
+    return get_loader().wait()
+
+def json_response(start_response, status, body):
+    payload = json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+    start_response(status, [('Content-Type', 'application/json; charset=utf-8'),
+                            ('Content-Length', str(len(payload)))])
+    return [payload]
+
+def parse_recommend_query(query_string, known_genres):
+    # (title, genres, k) from the query string; ValueError describes a bad parameter
+    params = parse_qs(query_string)
+    title = params.get('title', [''])[0].strip()
+    # Genres may be repeated (?genres=A&genres=B) or comma separated (?genres=A,B)
+    genres = [genre.strip() for value in params.get('genres', []) for genre in value.split(',') if genre.strip()]
+    unknown = [genre for genre in genres if genre not in known_genres]
+    if unknown:
+        raise ValueError(f"Unknown genres: {', '.join(unknown)}")
+    try:
+        k = int(params.get('k', ['10'])[0])
+    except ValueError:
+        raise ValueError("k must be an integer")
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}")
+    if not title and not genres:
+        raise ValueError("Give a title, at least one genre, or both")
+    return title, genres, k
+
+def handle_recommend(environ, start_response, recommender):
+    try:
+        title, genres, k = parse_recommend_query(environ.get('QUERY_STRING', ''), recommender.genre_index.genres)
+    except ValueError as e:
+        return json_response(start_response, '400 Bad Request', {'error': str(e)})
+
+    start = time.perf_counter()
+    try:
+        result = recommender.recommend(title, genres, k, warn=log)
+    except Exception as e:
+        log(f"Error in recommendation for {title!r}: {str(e)}")
+        return json_response(start_response, '500 Internal Server Error', {'error': "Error in recommendation"})
+    if result is None:
+        return json_response(start_response, '404 Not Found', {'error': f"Movie '{title}' not found in database"})
+
+    result.update({'query': title or None, 'genres': genres, 'k': k,
+                   'seconds': time.perf_counter() - start})
+    return json_response(start_response, '200 OK', result)
+
+def application(environ, start_response):
+    if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+        return json_response(start_response, '405 Method Not Allowed', {'error': "Only GET is supported"})
+    path = environ.get('PATH_INFO', '')
+    if path == '/healthz':
+        # Readiness: 503 until this worker's warm-up has loaded the data
+        loader = get_loader()
+        if not loader.ready():
+            return json_response(start_response, '503 Service Unavailable', {'status': 'loading'})
+        if loader.failed:
+            return json_response(start_response, '503 Service Unavailable', {'status': 'data files missing'})
+        return json_response(start_response, '200 OK', {'status': 'ok', 'movies': len(loader.recommender.catalog),
+                                                        'startup': loader.stats()})
+    recommender = get_recommender()
+    if recommender is None:
+        return json_response(start_response, '503 Service Unavailable',
+                             {'error': "Failed to load required data files. Please check the data files."})
+    if path == '/recommend':
+        return handle_recommend(environ, start_response, recommender)
+    if path == '/stats':
+        stats = recommender.stats()
+        stats['startup'] = get_loader().stats()
+        stats['pid'] = os.getpid()
+        return json_response(start_response, '200 OK', stats)
+    return json_response(start_response, '404 Not Found', {'error': f"No such endpoint: {path}"})
+
+def serve_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class APIServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{args.host}:{args.port}")
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('timeout', 60)
+            # Each worker starts loading as soon as it is forked, not on its first request
+            self.cfg.set('post_fork', lambda server, worker: get_loader())
+
+        def load(self):
+            return application
+
+    APIServer().run()
+
+def serve_stdlib(args):
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIServer, make_server
+
+    class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+
+    get_loader()
+    server = make_server(args.host, args.port, application, server_class=ThreadingWSGIServer)
+    print(f"Serving on http://{args.host}:{args.port} (single process, one thread per request)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+def main():
+    global DATA_DIR
+    parser = argparse.ArgumentParser(description="Serve movie recommendations as JSON over HTTP")
+    parser.add_argument('--data-dir', default=DATA_DIR or os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)),
+                        help="Worker processes (gunicorn)")
+    parser.add_argument('--threads', type=int, default=8, help="Threads per worker")
+    parser.add_argument('--stdlib', action='store_true', help="Use the threaded stdlib server even if gunicorn is installed")
+    args = parser.parse_args()
+    DATA_DIR = args.data_dir
+
+    try:
+        import gunicorn
+    except ImportError:
+        args.stdlib = True
+        print("gunicorn is not installed; falling back to the single-process stdlib server")
+    if args.stdlib:
+        serve_stdlib(args)
+    else:
+        serve_gunicorn(args)
+
+if __name__ == "__main__":
+    main()
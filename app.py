@@ -1,100 +1,120 @@
-import joblib
 import streamlit as st
-import requests
-import pandas as pd
 import time
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-import json
 import urllib.parse
 import numpy as np
-from functools import lru_cache
-import concurrent.futures
-from difflib import SequenceMatcher
-import os
-import stat
-import pickle
-
-def check_file_access(file_path):
-    try:
-        # Check if file exists
-        if not os.path.exists(file_path):
-            return False, "File does not exist"
-            
-        # Check file permissions
-        file_stat = os.stat(file_path)
-        if not (file_stat.st_mode & stat.S_IRUSR):
-            return False, "File is not readable"
-            
-        # Check file size
-        if os.path.getsize(file_path) == 0:
-            return False, "File is empty"
-            
-        return True, "File is accessible"
-    except Exception as e:
-        return False, f"Error checking file: {str(e)}"
+import threading
+from collections import deque
+from metadata_cache import MemoryCache
+from recommender import RecommenderLoader, open_metadata_cache
+from result_cache import PRECOMPUTE_TOP_N, ResultCache, result_key
+
+# Start of this script execution, for the per-run timing in the metrics panel
+script_started = time.perf_counter()
+
+@st.cache_resource
+def load_recommender_loader(_details_cache, _metadata_cache, _result_cache):
+    # Process-wide recommender (catalog, title indexes, similarity data, genre
+    # index), shared by every rerun and session. It loads on a warm-up thread so
+    # the first page renders right away, and reloads when an artifact file changes.
+    return RecommenderLoader(details_cache=_details_cache, metadata_cache=_metadata_cache,
+                             result_cache=_result_cache)
+
+@st.cache_resource
+def load_metadata_cache():
+    # On-disk TMDB details shared by every session and process; None if the file can't be opened
+    return open_metadata_cache(warn=st.warning)
+
+@st.cache_resource
+def load_details_cache():
+    # Bounded in-memory details cache shared by every session in this process
+    return MemoryCache()
+
+@st.cache_resource
+def load_result_cache():
+    # Finished recommendation lists shared by every session in this process
+    return ResultCache()
+
+class ScriptRunStats:
+    # How often app.py runs per user action, across every session of this process
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.clicks = 0
+        self.click_runs = 0
+        self.run_seconds = deque(maxlen=1000)
+
+    def record_run(self, seconds):
+        with self._lock:
+            self.runs += 1
+            self.run_seconds.append(seconds)
+
+    def record_click(self, runs):
+        # A click whose results are on screen, and the session's script executions it took
+        with self._lock:
+            self.clicks += 1
+            self.click_runs += runs
+
+    def stats(self):
+        with self._lock:
+            run_ms = np.array(self.run_seconds) * 1000 if self.run_seconds else None
+            return {
+                'script_runs': self.runs,
+                'recommend_clicks': self.clicks,
+                'script_runs_per_click': self.click_runs / self.clicks if self.clicks else None,
+                'run_p50_ms': float(np.percentile(run_ms, 50)) if run_ms is not None else None,
+                'run_p95_ms': float(np.percentile(run_ms, 95)) if run_ms is not None else None,
+            }
 
-def safe_load_data(filename):
-    try:
-        file_path = find_data_file(filename)
-        if file_path is None:
-            return None
-            
-        # Try to load the file
-        try:
-            data = joblib.load(file_path)
-            return data
-        except Exception as e1:
-            try:
-                with open(file_path, 'rb') as f:
-                    data = pickle.load(f)
-                return data
-            except Exception as e2:
-                try:
-                    data = np.load(file_path, allow_pickle=True)
-                    return data
-                except Exception as e3:
-                    st.error(f"Failed to load {filename}")
-                    return None
-                    
-    except Exception as e:
-        st.error(f"Error with {filename}")
-        return None
-
-def find_data_file(filename):
-    # Possible locations where the file might be
-    possible_paths = [
-        os.path.join(os.path.dirname(os.path.abspath(__file__)), filename),
-        os.path.join(os.getcwd(), filename),
-        os.path.join('/mount/src/movie-recommendation', filename),
-        filename
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            return path
-    
-    return None
+@st.cache_resource
+def load_run_stats():
+    return ScriptRunStats()
 
 # Load data files with error handling
 try:
-    # Load the files
-    movies = safe_load_data('movies.pkl')
-    movie_list = safe_load_data('movie_list.pkl')
-    similarity = safe_load_data('similarity.pkl')
-
-    if movies is None or movie_list is None or similarity is None:
-        st.error("Failed to load required data files. Please check the data files.")
-        st.stop()
+    # Process-wide caches, resolved here so the precompute thread uses the same objects
+    details_cache = load_details_cache()
+    metadata_cache = load_metadata_cache()
+    result_cache = load_result_cache()
+    run_stats = load_run_stats()
+    loader = load_recommender_loader(details_cache, metadata_cache, result_cache)
+    # None until the warm-up thread is done; require_recommender() waits for it
+    recommender = loader.current()
 except Exception as e:
     st.error("Error loading data files")
     st.stop()
 
-# Initialize session state for loading
-if 'is_loading' not in st.session_state:
-    st.session_state.is_loading = False
+def show_load_errors():
+    for warning in loader.warnings:
+        st.warning(warning)
+    if loader.failed:
+        st.error("Failed to load required data files. Please check the data files.")
+        st.stop()
+
+def require_recommender():
+    # The first interaction that needs the data waits for the warm-up to finish
+    global recommender
+    if recommender is None:
+        with st.spinner("Loading the movie catalog..."):
+            recommender = loader.wait()
+        show_load_errors()
+    return recommender
+
+if loader.ready():
+    show_load_errors()
+
+# Initialize session state for results
 if 'recommended_movies' not in st.session_state:
     st.session_state.recommended_movies = None
+# Script executions in this session so far, and the one a pending click happened in
+st.session_state.script_runs = st.session_state.get('script_runs', 0) + 1
+if 'click_run' not in st.session_state:
+    st.session_state.click_run = None
+
+def finish_click():
+    # The last click's results are on screen: record how many runs it took to get there
+    if st.session_state.click_run is not None:
+        run_stats.record_click(st.session_state.script_runs - st.session_state.click_run + 1)
+        st.session_state.click_run = None
 
 # Enhanced Custom CSS for modern UI
 st.markdown("""
@@ -579,242 +599,75 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Create a movie index dictionary for faster lookups
-movie_index = {}
-
-# Cache for movie details
-movie_details_cache = {}
-
-def initialize_movie_index():
-    global movie_index
-    for idx, title in enumerate(movies['title']):
-        movie_index[title.lower()] = idx
-
-def fetch_poster(movie_id):
-    max_retries = 3
-    retry_delay = 1  # seconds
-    
-    # Configure retry strategy
-    retry_strategy = Retry(
-        total=max_retries,
-        backoff_factor=retry_delay,
-        status_forcelist=[429, 500, 502, 503, 504],
-    )
-    
-    # Create a session with retry strategy
-    session = requests.Session()
-    session.mount("https://", HTTPAdapter(max_retries=retry_strategy))
-    
-    try:
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key=3d05f117126e1e8778d85a868b27b363&language=en-US"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = session.get(url, headers=headers, timeout=10)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        
-        data = response.json()
-        if 'poster_path' in data and data['poster_path']:
-            return "https://image.tmdb.org/t/p/w500/" + data['poster_path']
-        return None
-    except requests.exceptions.RequestException as e:
-        st.warning(f"Warning: Could not fetch poster for movie ID {movie_id}. Error: {str(e)}")
-        return None
-
-@lru_cache(maxsize=1000)
-def fetch_movie_details(movie_id):
-    if movie_id in movie_details_cache:
-        return movie_details_cache[movie_id]
-        
-    max_retries = 3
-    retry_delay = 1  # seconds
-    
-    retry_strategy = Retry(
-        total=max_retries,
-        backoff_factor=retry_delay,
-        status_forcelist=[429, 500, 502, 503, 504],
-    )
-    
-    session = requests.Session()
-    session.mount("https://", HTTPAdapter(max_retries=retry_strategy))
-    
-    try:
-        # Fetch movie details, credits, and videos in parallel
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            # Create URLs
-            movie_url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key=3d05f117126e1e8778d85a868b27b363&language=en-US"
-            credits_url = f"https://api.themoviedb.org/3/movie/{movie_id}/credits?api_key=3d05f117126e1e8778d85a868b27b363"
-            videos_url = f"https://api.themoviedb.org/3/movie/{movie_id}/videos?api_key=3d05f117126e1e8778d85a868b27b363&language=en-US"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            # Submit all requests
-            future_movie = executor.submit(session.get, movie_url, headers=headers, timeout=10)
-            future_credits = executor.submit(session.get, credits_url, headers=headers, timeout=10)
-            future_videos = executor.submit(session.get, videos_url, headers=headers, timeout=10)
-            
-            # Get responses
-            movie_response = future_movie.result()
-            credits_response = future_credits.result()
-            videos_response = future_videos.result()
-            
-            movie_response.raise_for_status()
-            credits_response.raise_for_status()
-            videos_response.raise_for_status()
-            
-            data = movie_response.json()
-            credits_data = credits_response.json()
-            videos_data = videos_response.json()
-
-        # Format budget and revenue
-        budget = data.get('budget', 0)
-        revenue = data.get('revenue', 0)
-        formatted_budget = f"${budget:,}" if budget > 0 else "Not available"
-        formatted_revenue = f"${revenue:,}" if revenue > 0 else "Not available"
-
-        # Find the best trailer
-        trailer_key = None
-        if 'results' in videos_data:
-            for video in videos_data['results']:
-                if video['type'] == 'Trailer' and video['site'] == 'YouTube' and video.get('official', False):
-                    trailer_key = video['key']
-                    break
-            
-            if not trailer_key:
-                for video in videos_data['results']:
-                    if video['type'] == 'Trailer' and video['site'] == 'YouTube':
-                        trailer_key = video['key']
-                        break
-
-        # Get main cast (first 3)
-        main_cast = []
-        if 'cast' in credits_data:
-            for actor in credits_data['cast'][:3]:
-                main_cast.append({
-                    'name': actor['name'],
-                    'character': actor['character'],
-                    'profile_path': f"https://image.tmdb.org/t/p/w200/{actor['profile_path']}" if actor.get('profile_path') else None
-                })
-
-        result = {
-            'poster': "https://image.tmdb.org/t/p/w500/" + data['poster_path'] if data.get('poster_path') else None,
-            'overview': data.get('overview', 'No description available'),
-            'release_date': data.get('release_date', 'N/A'),
-            'vote_average': data.get('vote_average', 'N/A'),
-            'tmdb_url': f"https://www.themoviedb.org/movie/{movie_id}",
-            'trailer_key': trailer_key,
-            'budget': formatted_budget,
-            'revenue': formatted_revenue,
-            'runtime': f"{data.get('runtime', 0)} minutes" if data.get('runtime') else "Not available",
-            'genres': [genre['name'] for genre in data.get('genres', [])],
-            'main_cast': main_cast
-        }
-        
-        # Cache the result
-        movie_details_cache[movie_id] = result
-        return result
-        
-    except requests.exceptions.RequestException as e:
-        st.warning(f"Warning: Could not fetch details for movie ID {movie_id}. Error: {str(e)}")
-        return None
-
-def find_movie_index(movie_name):
-    movie_name = movie_name.lower().strip()
-    
-    # First try exact match
-    if movie_name in movie_index:
-        return movie_index[movie_name]
-    
-    # If no exact match, find similar titles
-    best_match = None
-    best_score = 0.8  # Minimum similarity threshold
-    
-    for title in movie_index.keys():
-        # Calculate similarity score
-        score = SequenceMatcher(None, movie_name, title).ratio()
-        
-        # If we find a better match, update
-        if score > best_score:
-            best_score = score
-            best_match = title
-    
-    if best_match:
-        st.info(f"Showing results for '{best_match}' (similar to '{movie_name}')")
-        return movie_index[best_match]
-    
-    return None
-
-def recommend(movie):
+def render_cards_progressively(rows, searched=None):
+    # Skeleton cards go out first in their final order; each is replaced by the
+    # real card the moment its details arrive, so the first card only waits for
+    # the fastest TMDB response instead of the slowest
+    slots = []
+    for row in rows:
+        slot = st.empty()
+        with slot.container():
+            render_skeleton_card(recommender.catalog.title(row))
+        slots.append(slot)
+
+    cards = [None] * len(rows)
+    complete = True
+    for position, card, fetched in recommender.iter_cards(rows, searched=searched, warn=st.warning):
+        cards[position] = card
+        complete = complete and fetched
+        if card is None:
+            slots[position].empty()
+        else:
+            with slots[position].container():
+                render_movie_card(card)
+    return [card for card in cards if card is not None], complete
+
+def render_cached(key, render):
+    # Serve a finished list from the shared result cache, else render it
+    # progressively and cache it for the next visitor
+    start = time.perf_counter()
+    hit, results = result_cache.lookup(key)
+    if hit:
+        for movie in results:
+            render_movie_card(movie)
+    else:
+        results, complete = render()
+        result_cache.store(key, results, complete)
+    result_cache.record(hit, time.perf_counter() - start)
+    return results
+
+def recommend(movie, genres=None, k=10):
+    # Renders the recommendations for `movie` as they load and returns them
     try:
         # Find the movie index using fuzzy matching
-        index = find_movie_index(movie)
+        index, best_match = recommender.find_movie_index(movie)
         if index is None:
             st.error(f"Movie '{movie}' not found in database")
             return []
-        
-        # First get the searched movie details
-        searched_movie = {
-            'title': movies.iloc[index].title,
-            'poster': fetch_poster(movies.iloc[index].movie_id),
-            'overview': movies.iloc[index].overview if 'overview' in movies.columns else 'No description available',
-            'release_date': movies.iloc[index].release_date if 'release_date' in movies.columns else 'N/A',
-            'vote_average': movies.iloc[index].vote_average if 'vote_average' in movies.columns else 'N/A',
-            'tmdb_url': f"https://www.themoviedb.org/movie/{movies.iloc[index].movie_id}",
-            'trailer_key': None,  # Will be updated with fetch_movie_details
-            'budget': 'Not available',
-            'revenue': 'Not available',
-            'runtime': 'Not available',
-            'genres': [],
-            'main_cast': []
-        }
-        
-        # Get full details for the searched movie
-        details = fetch_movie_details(movies.iloc[index].movie_id)
-        if details:
-            searched_movie.update(details)
-        
-        # Use numpy for faster sorting
-        distances = np.array(similarity[index])
-        top_indices = np.argsort(distances)[::-1][1:11]  # Get top 10 similar movies
-        
-        # Fetch movie details in parallel
-        recommended_movies = [searched_movie]  # Add searched movie as first result
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_movie = {
-                executor.submit(fetch_movie_details, movies.iloc[i].movie_id): i 
-                for i in top_indices
-            }
-            
-            for future in concurrent.futures.as_completed(future_to_movie):
-                i = future_to_movie[future]
-                try:
-                    details = future.result()
-                    if details:
-                        recommended_movies.append({
-                            'title': movies.iloc[i].title,
-                            'poster': details['poster'],
-                            'overview': details['overview'],
-                            'release_date': details['release_date'],
-                            'vote_average': details['vote_average'],
-                            'tmdb_url': details['tmdb_url'],
-                            'trailer_key': details['trailer_key'],
-                            'budget': details['budget'],
-                            'revenue': details['revenue'],
-                            'runtime': details['runtime'],
-                            'genres': details['genres'],
-                            'main_cast': details['main_cast']
-                        })
-                except Exception as e:
-                    st.warning(f"Error fetching details for movie {movies.iloc[i].title}: {str(e)}")
-
-        return recommended_movies
+        if best_match:
+            st.info(f"Showing results for '{best_match}' (similar to '{movie.lower().strip()}')")
+
+        return render_cached(result_key(index, genres, k, recommender.version),
+                             lambda: render_cards_progressively(recommender.recommendation_rows(index, genres, k),
+                                                                searched=index))
     except Exception as e:
         st.error(f"Error in recommendation: {str(e)}")
         return []
 
+def browse_genres(genres, k=10):
+    # Genres come from the local index; each batch of cards is drawn as it loads
+    return render_cached(result_key(None, genres, k, recommender.version),
+                         lambda: recommender.build_genre_browse(genres, k, build_cards=render_cards_progressively))
+
+@st.cache_resource
+def start_precompute(_recommender, _indices, version):
+    # Once per process (and artifacts version): fill the result cache for the most
+    # popular titles in the background so their first visitors get a cache hit
+    thread = threading.Thread(target=_recommender.precompute, args=(_indices,),
+                              name='result-precompute', daemon=True)
+    thread.start()
+    return thread
+
 def generate_share_text(movie):
     title = movie.get('title', 'Unknown Movie')
     year = movie.get('release_date', 'N/A')[:4] if movie.get('release_date') else 'N/A'
@@ -824,24 +677,142 @@ def generate_share_text(movie):
     short_overview = overview[:100] + '...' if len(overview) > 100 else overview
     return f"🎬 {title} ({year}) | Rating: {rating}/10\n\n{short_overview}\n\n#MovieRecommendation #Film"
 
+def render_movie_card(movie):
+    with st.container():
+        st.markdown('<div class="movie-card">', unsafe_allow_html=True)
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            st.markdown(f'''
+                <a href="{movie["tmdb_url"]}" target="_blank">
+                    <img src="{movie["poster"]}" style="width:100%; border-radius:15px; transition: all 0.3s ease;">
+                </a>
+            ''', unsafe_allow_html=True)
+
+        with col2:
+            st.markdown(f'''
+                <a href="{movie["tmdb_url"]}" target="_blank" style="text-decoration: none;">
+                    <h3 class="movie-title">{movie["title"]}</h3>
+                </a>
+                <p class="movie-info">📅 {movie["release_date"]}</p>
+                <p class="movie-info">⭐ {movie["vote_average"]}/10</p>
+            ''', unsafe_allow_html=True)
+
+            if movie.get('genres'):
+                genres_html = '<div style="margin: 15px 0;">'
+                for genre in movie['genres']:
+                    genres_html += f'<span class="genre-tag">{genre}</span>'
+                genres_html += '</div>'
+                st.markdown(genres_html, unsafe_allow_html=True)
+
+            st.markdown(f'<p class="movie-overview">{movie["overview"]}</p>', unsafe_allow_html=True)
+
+            # Movie Trivia Section with enhanced styling
+            with st.expander("🎬 Movie Trivia", expanded=False):
+                st.markdown(f'''
+                    <div class="movie-trivia">
+                        <p class="movie-info"><strong>💰 Budget:</strong> {movie.get('budget', 'Not available')}</p>
+                        <p class="movie-info"><strong>💵 Revenue:</strong> {movie.get('revenue', 'Not available')}</p>
+                        <p class="movie-info"><strong>⏱️ Runtime:</strong> {movie.get('runtime', 'Not available')}</p>
+                    </div>
+                ''', unsafe_allow_html=True)
+
+                if movie.get('main_cast'):
+                    st.markdown('<p class="movie-info"><strong>🎭 Main Cast:</strong></p>', unsafe_allow_html=True)
+                    cast_cols = st.columns(3)
+                    for i, actor in enumerate(movie['main_cast']):
+                        with cast_cols[i]:
+                            st.markdown('<div class="cast-member">', unsafe_allow_html=True)
+                            if actor['profile_path']:
+                                st.image(actor['profile_path'], width=80)
+                            st.markdown(f'''
+                                <p class="movie-info" style="text-align: center; font-weight: 500;">{actor["name"]}</p>
+                                <p class="movie-info" style="text-align: center; font-size: 0.8em;">as {actor["character"]}</p>
+                            ''', unsafe_allow_html=True)
+                            st.markdown('</div>', unsafe_allow_html=True)
+
+            # Create a container for the buttons with enhanced styling
+            button_col1, button_col2, button_col3 = st.columns([1, 1, 1])
+
+            with button_col1:
+                st.markdown(f'''
+                    <a href="{movie["tmdb_url"]}" target="_blank">
+                        <button class="action-button">
+                            <span style="font-size: 1.2em;">🎬</span> View on TMDB
+                        </button>
+                    </a>
+                ''', unsafe_allow_html=True)
+
+            with button_col2:
+                if movie['trailer_key']:
+                    st.markdown(f'''
+                        <a href="https://www.youtube.com/watch?v={movie['trailer_key']}" target="_blank">
+                            <button class="action-button" style="background: linear-gradient(45deg, #ff0000, #cc0000);">
+                                <span style="font-size: 1.2em;">▶️</span> Watch Trailer
+                            </button>
+                        </a>
+                    ''', unsafe_allow_html=True)
+
+            with button_col3:
+                if movie.get('title'):
+                    share_text = generate_share_text(movie)
+                    share_url = f"https://twitter.com/intent/tweet?text={urllib.parse.quote(share_text)}&url={urllib.parse.quote(movie['tmdb_url'])}"
+                    st.markdown(f'''
+                        <a href="{share_url}" target="_blank">
+                            <button class="action-button" style="background: linear-gradient(45deg, #1DA1F2, #0d8bd9);">
+                                <span style="font-size: 1.2em;">𝕏</span> Share
+                            </button>
+                        </a>
+                    ''', unsafe_allow_html=True)
+
+        st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown("---")
+
+def render_skeleton_card(title):
+    # Placeholder shown in a movie's slot until its details arrive
+    with st.container():
+        st.markdown(f'''
+            <div class="movie-card">
+                <h3 class="movie-title">{title}</h3>
+                <p class="movie-info">Loading details...</p>
+            </div>
+        ''', unsafe_allow_html=True)
+        st.markdown("---")
+
 # Main UI
 st.markdown('<h1 class="header">🎬 Movie Suggestion System</h1>', unsafe_allow_html=True)
 
 # Container for better layout
 with st.container():
     try:
-        # Initialize the movie index
-        initialize_movie_index()
+        # Popular titles are precomputed once the warm-up has loaded the recommender
+        if recommender is not None and PRECOMPUTE_TOP_N > 0:
+            start_precompute(recommender, recommender.title_autocomplete.by_rank[:PRECOMPUTE_TOP_N], recommender.version)
     except Exception as e:
         st.error(f"Error loading data files: {str(e)}")
         st.stop()
 
-    movie_list = movies['title'].values
+    # Only the best matches for the typed prefix are sent to the browser
+    search_text = st.text_input(
+        "🎥 Type a movie title",
+        placeholder="Search Movie...",
+        key="movie_search"
+    )
+    # Typed text needs the catalog; before that, popular titles are offered once it has loaded
+    if search_text.strip():
+        suggestions = require_recommender().title_autocomplete.complete(search_text)
+        if not suggestions:
+            # A typo matches no word start: offer the closest title from the fuzzy index instead
+            index, _ = recommender.find_movie_index(search_text)
+            suggestions = [recommender.catalog.title(index)] if index is not None else []
+    else:
+        suggestions = recommender.title_autocomplete.complete('') if recommender is not None else []
+    # Only an exact title is picked for the user; anything else waits for their choice
+    exact_match = bool(suggestions) and suggestions[0].lower() == search_text.lower().strip()
     selected_movie = st.selectbox(
-        "🎥 Type or select a movie from the dropdown",
-        movie_list,
-        index=None,
-        placeholder="Search Movie..."
+        "🎬 Select a movie from the matches",
+        suggestions,
+        index=0 if exact_match else None,
+        placeholder="Select Movie..."
     )
 
     # Add genre filter with enhanced styling
@@ -862,14 +833,17 @@ with st.container():
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        if st.button('Get Recommendations', key='recommend_button'):
-            st.session_state.is_loading = True
-            st.session_state.recommended_movies = None
-            st.experimental_rerun()
-
-    # Show loading animation if in loading state
-    if st.session_state.is_loading:
-        st.markdown('''
+        # The click is handled further down in this same run: no reruns, so one
+        # click costs exactly one execution of the script
+        clicked = st.button('Get Recommendations', key='recommend_button')
+
+    # Show loading animation while this run computes the recommendations
+    if clicked:
+        require_recommender()
+        st.session_state.recommended_movies = None
+        st.session_state.click_run = st.session_state.script_runs
+        loading_slot = st.empty()
+        loading_slot.markdown('''
             <div class="loading-container">
                 <div class="loading-spinner"></div>
                 <div class="loading-text">Loading</div>
@@ -877,146 +851,43 @@ with st.container():
         ''', unsafe_allow_html=True)
         
         if not selected_movie and not selected_genres:
+            loading_slot.empty()
             st.warning("Please select a movie or at least one genre!")
-            st.session_state.is_loading = False
-            st.stop()
-        
-        if selected_movie:
-            recommended_movies = recommend(selected_movie)
-            if recommended_movies:
-                if selected_genres:
-                    filtered_movies = []
-                    for movie in recommended_movies:
-                        if movie.get('genres') and any(genre in movie['genres'] for genre in selected_genres):
-                            filtered_movies.append(movie)
-                    recommended_movies = filtered_movies
-                    if not recommended_movies:
-                        st.warning("No movies found matching the selected genres!")
-                        st.session_state.is_loading = False
-                        st.stop()
         else:
-            recommended_movies = []
-            for i in range(len(movies)):
-                movie_id = movies.iloc[i].movie_id
-                details = fetch_movie_details(movie_id)
-                if details and details.get('genres') and any(genre in details['genres'] for genre in selected_genres):
-                    recommended_movies.append({
-                        'title': movies.iloc[i].title,
-                        'poster': details['poster'],
-                        'overview': details['overview'],
-                        'release_date': details['release_date'],
-                        'vote_average': details['vote_average'],
-                        'tmdb_url': details['tmdb_url'],
-                        'trailer_key': details['trailer_key'],
-                        'budget': details['budget'],
-                        'revenue': details['revenue'],
-                        'runtime': details['runtime'],
-                        'genres': details['genres'],
-                        'main_cast': details['main_cast']
-                    })
-                    if len(recommended_movies) >= 10:
-                        break
-            
-            if not recommended_movies:
+            # Cards are drawn as their details arrive, so they are rendered here directly
+            st.markdown('<div class="recommendations-container">', unsafe_allow_html=True)
+            st.markdown('<h2 class="recommendations-title">Recommended Movies</h2>', unsafe_allow_html=True)
+            if selected_movie:
+                st.session_state.recommended_movies = recommend(selected_movie, selected_genres)
+            else:
+                st.session_state.recommended_movies = browse_genres(selected_genres)
+            loading_slot.empty()
+
+            if selected_genres and not st.session_state.recommended_movies:
                 st.warning("No movies found matching the selected genres!")
-                st.session_state.is_loading = False
-                st.stop()
-
-        st.session_state.recommended_movies = recommended_movies
-        st.session_state.is_loading = False
-        st.experimental_rerun()
+        finish_click()
 
-    # Show recommendations if they exist
-    if st.session_state.recommended_movies:
+    # Other interactions redraw the last results from the session
+    elif st.session_state.recommended_movies:
         st.markdown('<div class="recommendations-container">', unsafe_allow_html=True)
         st.markdown('<h2 class="recommendations-title">Recommended Movies</h2>', unsafe_allow_html=True)
         
         for movie in st.session_state.recommended_movies:
-            with st.container():
-                st.markdown('<div class="movie-card">', unsafe_allow_html=True)
-                col1, col2 = st.columns([1, 2])
-                with col1:
-                    st.markdown(f'''
-                        <a href="{movie["tmdb_url"]}" target="_blank">
-                            <img src="{movie["poster"]}" style="width:100%; border-radius:15px; transition: all 0.3s ease;">
-                        </a>
-                    ''', unsafe_allow_html=True)
-                    
-                with col2:
-                    st.markdown(f'''
-                        <a href="{movie["tmdb_url"]}" target="_blank" style="text-decoration: none;">
-                            <h3 class="movie-title">{movie["title"]}</h3>
-                        </a>
-                        <p class="movie-info">📅 {movie["release_date"]}</p>
-                        <p class="movie-info">⭐ {movie["vote_average"]}/10</p>
-                    ''', unsafe_allow_html=True)
-                    
-                    if movie.get('genres'):
-                        genres_html = '<div style="margin: 15px 0;">'
-                        for genre in movie['genres']:
-                            genres_html += f'<span class="genre-tag">{genre}</span>'
-                        genres_html += '</div>'
-                        st.markdown(genres_html, unsafe_allow_html=True)
-                    
-                    st.markdown(f'<p class="movie-overview">{movie["overview"]}</p>', unsafe_allow_html=True)
-                    
-                    # Movie Trivia Section with enhanced styling
-                    with st.expander("🎬 Movie Trivia", expanded=False):
-                        st.markdown(f'''
-                            <div class="movie-trivia">
-                                <p class="movie-info"><strong>💰 Budget:</strong> {movie.get('budget', 'Not available')}</p>
-                                <p class="movie-info"><strong>💵 Revenue:</strong> {movie.get('revenue', 'Not available')}</p>
-                                <p class="movie-info"><strong>⏱️ Runtime:</strong> {movie.get('runtime', 'Not available')}</p>
-                            </div>
-                        ''', unsafe_allow_html=True)
-                        
-                        if movie.get('main_cast'):
-                            st.markdown('<p class="movie-info"><strong>🎭 Main Cast:</strong></p>', unsafe_allow_html=True)
-                            cast_cols = st.columns(3)
-                            for i, actor in enumerate(movie['main_cast']):
-                                with cast_cols[i]:
-                                    st.markdown('<div class="cast-member">', unsafe_allow_html=True)
-                                    if actor['profile_path']:
-                                        st.image(actor['profile_path'], width=80)
-                                    st.markdown(f'''
-                                        <p class="movie-info" style="text-align: center; font-weight: 500;">{actor["name"]}</p>
-                                        <p class="movie-info" style="text-align: center; font-size: 0.8em;">as {actor["character"]}</p>
-                                    ''', unsafe_allow_html=True)
-                                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Create a container for the buttons with enhanced styling
-                    button_col1, button_col2, button_col3 = st.columns([1, 1, 1])
-                    
-                    with button_col1:
-                        st.markdown(f'''
-                            <a href="{movie["tmdb_url"]}" target="_blank">
-                                <button class="action-button">
-                                    <span style="font-size: 1.2em;">🎬</span> View on TMDB
-                                </button>
-                            </a>
-                        ''', unsafe_allow_html=True)
-                    
-                    with button_col2:
-                        if movie['trailer_key']:
-                            st.markdown(f'''
-                                <a href="https://www.youtube.com/watch?v={movie['trailer_key']}" target="_blank">
-                                    <button class="action-button" style="background: linear-gradient(45deg, #ff0000, #cc0000);">
-                                        <span style="font-size: 1.2em;">▶️</span> Watch Trailer
-                                    </button>
-                                </a>
-                            ''', unsafe_allow_html=True)
-                    
-                    with button_col3:
-                        if movie.get('title'):
-                            share_text = generate_share_text(movie)
-                            share_url = f"https://twitter.com/intent/tweet?text={urllib.parse.quote(share_text)}&url={urllib.parse.quote(movie['tmdb_url'])}"
-                            st.markdown(f'''
-                                <a href="{share_url}" target="_blank">
-                                    <button class="action-button" style="background: linear-gradient(45deg, #1DA1F2, #0d8bd9);">
-                                        <span style="font-size: 1.2em;">𝕏</span> Share
-                                    </button>
-                                </a>
-                            ''', unsafe_allow_html=True)
-                
-                st.markdown('</div>', unsafe_allow_html=True)
-                st.markdown("---")
\ No newline at end of file
+            render_movie_card(movie)
+        # A click whose results only appear in a later run counts every run in between
+        finish_click()
+
+# Cache hit rates, latencies and TMDB traffic of this server process
+run_stats.record_run(time.perf_counter() - script_started)
+with st.expander("📈 Performance metrics", expanded=False):
+    metrics = {
+        'script_runs': run_stats.stats(),
+        'startup': loader.stats(),
+        'recommendation_results': result_cache.stats(),
+        'movie_details_memory': details_cache.stats(),
+        'movie_details_disk': metadata_cache.stats() if metadata_cache is not None else None,
+    }
+    # TMDB traffic too, once the warm-up has imported the client
+    if recommender is not None:
+        metrics.update(recommender.stats())
+    st.json(metrics)
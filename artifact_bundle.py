@@ -0,0 +1,174 @@
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+import numpy as np
+
+# Everything the recommender needs at runtime in one file: raw, 64-byte
+# aligned array buffers followed by a JSON manifest recording the schema
+# version and, per array, its dtype, shape, offset and CRC-32. Opening it
+# memory-maps the file and wraps each buffer in a read-only numpy array, so
+# nothing is parsed or copied and worker processes share the page cache.
+# Strings are stored as one UTF-8 buffer plus int64 offsets. Unlike the
+# pickles, loading it never runs code from the file.
+#
+# Layout: MAGIC | manifest offset (u64) | manifest length (u64) | pad | arrays... | manifest
+BUNDLE_FILE = 'recommender.bundle'
+# 2: the stemmed tag strings are no longer stored
+SCHEMA_VERSION = 2
+MAGIC = b'MOVRECB\x00'
+HEADER = struct.Struct('<8sQQ')
+ALIGNMENT = 64
+
+# Arrays every recommender bundle holds: name -> (dtype, number of dimensions)
+REQUIRED_ARRAYS = {
+    'movie_ids': ('<i4', 1),
+    'title_buffer': ('|u1', 1),
+    'title_offsets': ('<i8', 1),
+    'genre_bits': ('<u4', 1),
+    'neighbor_indices': ('<i4', 2),
+    'neighbor_scores': ('<f4', 2),
+    'tag_data': ('<f8', 1),
+    'tag_indices': ('<i4', 1),
+    'tag_indptr': (None, 1),
+}
+
+class BundleError(ValueError):
+    pass
+
+def encode_strings(texts):
+    # (uint8 buffer, int64 offsets) with string i at buffer[offsets[i]:offsets[i + 1]]
+    encoded = [str(text).encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def decode_strings(buffer, offsets):
+    raw = bytes(buffer)
+    return [raw[start:stop].decode('utf-8') for start, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+def write_bundle(file_path, arrays, metadata=None):
+    # `arrays` maps names to numpy arrays (stored little-endian, C order); `metadata`
+    # is any JSON-serialisable dict kept in the manifest
+    manifest = {'schema_version': SCHEMA_VERSION, 'created': time.time(), 'metadata': metadata or {}, 'arrays': {}}
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * ALIGNMENT)  # header, filled in once the manifest's position is known
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+            f.write(b'\0' * (-f.tell() % ALIGNMENT))
+            offset = f.tell()
+            data = memoryview(array).cast('B') if array.size else b''
+            f.write(data)
+            manifest['arrays'][name] = {
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'offset': offset,
+                'nbytes': array.nbytes,
+                'crc32': zlib.crc32(data),
+            }
+        payload = json.dumps(manifest, sort_keys=True).encode('utf-8')
+        manifest_offset = f.tell()
+        f.write(payload)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, manifest_offset, len(payload)))
+    os.replace(tmp_path, file_path)
+    return file_path
+
+class ArtifactBundle:
+    def __init__(self, file_path, verify=True):
+        # Validates the header, manifest and array bounds; with `verify` also every
+        # array's checksum. Raises BundleError for anything that doesn't add up.
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < ALIGNMENT:
+                raise BundleError(f"{file_path} is too small to be an artifact bundle")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, manifest_offset, manifest_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise BundleError(f"{file_path} is not an artifact bundle")
+        if manifest_offset + manifest_length != size:
+            raise BundleError(f"{file_path} is truncated or has trailing data")
+        try:
+            self.manifest = json.loads(self._map[manifest_offset:manifest_offset + manifest_length])
+        except ValueError as e:
+            raise BundleError(f"Unreadable manifest in {file_path}: {str(e)}")
+        if not isinstance(self.manifest, dict):
+            raise BundleError(f"Unreadable manifest in {file_path}: not a JSON object")
+        if self.manifest.get('schema_version') != SCHEMA_VERSION:
+            raise BundleError(f"{file_path} has schema version {self.manifest.get('schema_version')}, "
+                              f"expected {SCHEMA_VERSION}; rebuild it with build_artifacts.py")
+        self.metadata = self.manifest.get('metadata', {})
+
+        self.arrays = {}
+        for name, entry in self.manifest.get('arrays', {}).items():
+            try:
+                dtype = np.dtype(entry['dtype'])
+                shape = tuple(int(size) for size in entry['shape'])
+                offset, nbytes = int(entry['offset']), int(entry['nbytes'])
+                crc32 = int(entry['crc32'])
+            except (KeyError, TypeError, ValueError) as e:
+                raise BundleError(f"Bad manifest entry for array {name} in {file_path}: {str(e)}")
+            if dtype.hasobject or nbytes != dtype.itemsize * int(np.prod(shape)):
+                raise BundleError(f"Array {name} in {file_path}: dtype {dtype} and shape {shape} don't match {nbytes} bytes")
+            if offset % ALIGNMENT or offset < ALIGNMENT or offset + nbytes > manifest_offset:
+                raise BundleError(f"Array {name} in {file_path} lies outside the data section")
+            if verify and zlib.crc32(memoryview(self._map)[offset:offset + nbytes]) != crc32:
+                raise BundleError(f"Checksum mismatch for array {name} in {file_path}")
+            # A read-only view of the mapping: no copy, pages are read on first touch
+            self.arrays[name] = np.frombuffer(self._map, dtype=dtype, count=int(np.prod(shape)),
+                                              offset=offset).reshape(shape)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    def strings(self, name):
+        # Decoded strings of a `<name>_buffer` / `<name>_offsets` pair
+        return decode_strings(self.arrays[f'{name}_buffer'], self.arrays[f'{name}_offsets'])
+
+def open_bundle(file_path, verify=True):
+    return ArtifactBundle(file_path, verify=verify)
+
+def check_recommender_bundle(bundle):
+    # Problems (as messages) with the arrays a recommender bundle must hold; empty when it is usable
+    problems = []
+    for name, (dtype, ndim) in REQUIRED_ARRAYS.items():
+        if name not in bundle:
+            problems.append(f"missing array {name}")
+        elif (bundle[name].dtype.str != dtype if dtype is not None else bundle[name].dtype.kind not in 'iu') \
+                or bundle[name].ndim != ndim:
+            problems.append(f"{name} is {bundle[name].dtype.str} with {bundle[name].ndim} dimensions, "
+                            f"expected {dtype or 'an integer dtype'} with {ndim}")
+    if problems:
+        return problems
+
+    movies = len(bundle['movie_ids'])
+    for name in ('title_offsets', 'tag_indptr'):
+        if len(bundle[name]) != movies + 1:
+            problems.append(f"{name} has {len(bundle[name])} entries, expected {movies + 1}")
+    offsets = bundle['title_offsets']
+    if len(offsets) and (offsets[0] != 0 or offsets[-1] != len(bundle['title_buffer'])
+                         or np.any(np.diff(offsets) < 0)):
+        problems.append("title_offsets don't describe title_buffer")
+    if len(bundle['genre_bits']) != movies:
+        problems.append(f"genre_bits has {len(bundle['genre_bits'])} entries, expected {movies}")
+    if len(bundle.metadata.get('genres', [])) > 32:
+        problems.append("more than 32 genres don't fit the genre bitsets")
+    neighbors = bundle['neighbor_indices']
+    if neighbors.shape != bundle['neighbor_scores'].shape or len(neighbors) != movies:
+        problems.append(f"neighbor tables are {neighbors.shape} / {bundle['neighbor_scores'].shape}, "
+                        f"expected {movies} rows each")
+    elif neighbors.size and (neighbors.min() < 0 or neighbors.max() >= movies):
+        problems.append("neighbor_indices point outside the catalog")
+    if bundle.metadata.get('tag_shape', [None])[0] != movies:
+        problems.append(f"tag vectors have shape {bundle.metadata.get('tag_shape')}, expected {movies} rows")
+    elif len(bundle['tag_data']) != len(bundle['tag_indices']) or bundle['tag_indptr'][-1] != len(bundle['tag_data']):
+        problems.append("tag_data, tag_indices and tag_indptr don't describe one CSR matrix")
+    return problems
@@ -0,0 +1,134 @@
+import argparse
+import os
+import time
+import joblib
+import numpy as np
+from artifact_bundle import BUNDLE_FILE, check_recommender_bundle, encode_strings, open_bundle, write_bundle
+from catalog import OPTIONAL_FIELDS
+from genre_index import GENRE_INDEX_NPZ, GenreIndex
+from similarity_engine import TAG_VECTORS_NPZ, TagSimilarityEngine
+from similarity_store import (
+    DEFAULT_TOP_K, NEIGHBORS_NPZ, SIMILARITY_NPY, load_neighbors, open_similarity, save_neighbors,
+    save_similarity, top_k_neighbors
+)
+
+def load_pickle(file_path):
+    # joblib reads both joblib dumps and plain pickles, so each file is parsed once
+    return joblib.load(file_path)
+
+def build_similarity_store(source_path, target_path, dtype=None):
+    print(f"Loading {source_path}")
+    start = time.perf_counter()
+    similarity = load_pickle(source_path)
+    print(f"Loaded {similarity.shape} {similarity.dtype} matrix in {time.perf_counter() - start:.2f}s")
+
+    save_similarity(similarity, target_path, dtype=dtype)
+    print(f"Wrote {target_path} ({os.path.getsize(target_path)} bytes)")
+
+def build_tag_engine(movie_list_path, target_path):
+    start = time.perf_counter()
+    new = load_pickle(movie_list_path)
+    engine = TagSimilarityEngine.from_tags(new['tags'])
+    engine.save(target_path)
+    print(f"Wrote {target_path} ({os.path.getsize(target_path)} bytes, "
+          f"{engine.vectors.nnz} non-zeros) in {time.perf_counter() - start:.2f}s")
+    return engine
+
+def build_neighbor_table(data_dir, target_path, k=DEFAULT_TOP_K, engine=None):
+    start = time.perf_counter()
+    npy_path = os.path.join(data_dir, SIMILARITY_NPY)
+    pkl_path = os.path.join(data_dir, 'similarity.pkl')
+    if os.path.exists(npy_path):
+        print(f"Reading similarities from {npy_path}")
+        similarity = open_similarity(npy_path)
+    elif os.path.exists(pkl_path):
+        print(f"Reading similarities from {pkl_path}")
+        similarity = load_pickle(pkl_path)
+    else:
+        # Rows are computed block by block from the sparse tag vectors
+        print("No similarity matrix found, computing similarities from the tag vectors")
+        similarity = engine or TagSimilarityEngine.load(os.path.join(data_dir, TAG_VECTORS_NPZ))
+
+    indices, scores = top_k_neighbors(similarity, k=k)
+    save_neighbors(target_path, indices, scores)
+    print(f"Wrote {target_path} ({os.path.getsize(target_path)} bytes, K={indices.shape[1]}) "
+          f"in {time.perf_counter() - start:.2f}s")
+
+def build_genre_index(movie_list_path, target_path):
+    index = GenreIndex.from_movie_list(load_pickle(movie_list_path))
+    index.save(target_path)
+    untagged = int((index.bits == 0).sum())
+    print(f"Wrote {target_path} ({len(index)} movies, {untagged} without genres)")
+
+def build_bundle(data_dir, target_path):
+    # Packs the catalog columns and the artifacts built above into one bundle, the
+    # only file the app and API need at runtime; pickles are only read here
+    start = time.perf_counter()
+    movies = load_pickle(os.path.join(data_dir, 'movies.pkl'))
+    movie_list = load_pickle(os.path.join(data_dir, 'movie_list.pkl'))
+    if len(movies) != len(movie_list):
+        raise ValueError(f"movies.pkl has {len(movies)} rows but movie_list.pkl has {len(movie_list)}")
+    engine = TagSimilarityEngine.load(os.path.join(data_dir, TAG_VECTORS_NPZ))
+    neighbor_indices, neighbor_scores = load_neighbors(os.path.join(data_dir, NEIGHBORS_NPZ))
+    genre_index = GenreIndex.load(os.path.join(data_dir, GENRE_INDEX_NPZ))
+
+    # Only what the runtime reads: the stemmed tags are already in the tag vectors
+    title_buffer, title_offsets = encode_strings(movies['title'])
+    vectors = engine.vectors
+    arrays = {
+        'movie_ids': movies['movie_id'].to_numpy(dtype=np.int32),
+        'title_buffer': title_buffer,
+        'title_offsets': title_offsets,
+        'genre_bits': genre_index.bits,
+        'neighbor_indices': neighbor_indices,
+        'neighbor_scores': neighbor_scores,
+        'tag_data': vectors.data.astype(np.float64),
+        'tag_indices': vectors.indices.astype(np.int32),
+        'tag_indptr': vectors.indptr,
+    }
+    extra_fields = {}
+    for field in OPTIONAL_FIELDS:
+        if field not in movies.columns:
+            continue
+        column = movies[field]
+        if column.dtype.kind in 'biuf':
+            arrays[f'extra_{field}'] = column.to_numpy()
+            extra_fields[field] = 'numeric'
+        else:
+            arrays[f'extra_{field}_buffer'], arrays[f'extra_{field}_offsets'] = encode_strings(column.fillna(''))
+            extra_fields[field] = 'string'
+    write_bundle(target_path, arrays, metadata={
+        'movies': len(movies),
+        'genres': genre_index.genres,
+        'tag_shape': list(vectors.shape),
+        'top_k': int(neighbor_indices.shape[1]),
+        'extra_fields': extra_fields,
+    })
+
+    problems = check_recommender_bundle(open_bundle(target_path))
+    if problems:
+        raise ValueError(f"Built an unusable bundle: {'; '.join(problems)}")
+    print(f"Wrote {target_path} ({os.path.getsize(target_path)} bytes, {len(arrays)} arrays) "
+          f"in {time.perf_counter() - start:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build runtime artifacts for the movie recommender")
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--dtype', default=None, help="Store the similarity matrix with this dtype (e.g. float32)")
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help="Neighbors to keep per movie")
+    args = parser.parse_args()
+
+    source_path = os.path.join(args.data_dir, 'similarity.pkl')
+    if os.path.exists(source_path):
+        build_similarity_store(source_path, os.path.join(args.data_dir, SIMILARITY_NPY), dtype=args.dtype)
+    else:
+        print(f"File {source_path} not found, skipping {SIMILARITY_NPY}")
+
+    engine = build_tag_engine(os.path.join(args.data_dir, 'movie_list.pkl'),
+                              os.path.join(args.data_dir, TAG_VECTORS_NPZ))
+    build_neighbor_table(args.data_dir, os.path.join(args.data_dir, NEIGHBORS_NPZ), k=args.top_k, engine=engine)
+    build_genre_index(os.path.join(args.data_dir, 'movie_list.pkl'), os.path.join(args.data_dir, GENRE_INDEX_NPZ))
+    build_bundle(args.data_dir, os.path.join(args.data_dir, BUNDLE_FILE))
+
+if __name__ == "__main__":
+    main()
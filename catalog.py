@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Column-oriented view of movies.pkl. Row lookups through DataFrame.iloc build
+# a pandas Series per call (tens of microseconds each); here every field is a
+# plain array, so title/movie_id lookups are single array reads. Tags are
+# not kept: only the tag vectors need them, and those are built offline.
+OPTIONAL_FIELDS = ('overview', 'release_date', 'vote_average', 'popularity', 'vote_count')
+
+class Catalog:
+    def __init__(self, movie_ids, titles, extra=None):
+        self.movie_ids = np.ascontiguousarray(movie_ids, dtype=np.int32)
+        # Interned so equal titles share one object and compare by identity first
+        self.titles = np.array([sys.intern(str(title)) for title in titles], dtype=object)
+        self.lower_titles = np.array([sys.intern(title.lower()) for title in self.titles], dtype=object)
+        self.extra = dict(extra or {})
+
+    @classmethod
+    def from_movies(cls, movies):
+        extra = {field: movies[field].to_numpy() for field in OPTIONAL_FIELDS if field in movies.columns}
+        return cls(movies['movie_id'].to_numpy(), movies['title'].to_numpy(), extra)
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        # Columns of an artifact bundle: ids stay views of the mapped file, only the
+        # titles (and optional string columns) are decoded
+        extra = {}
+        for field, kind in bundle.metadata.get('extra_fields', {}).items():
+            extra[field] = (np.array(bundle.strings(f'extra_{field}'), dtype=object) if kind == 'string'
+                            else bundle[f'extra_{field}'])
+        return cls(bundle['movie_ids'], bundle.strings('title'), extra=extra)
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def title(self, index):
+        return self.titles[index]
+
+    def movie_id(self, index):
+        return int(self.movie_ids[index])
+
+    def has(self, field):
+        return field in self.extra
+
+    def field(self, field, index, default=None):
+        # Optional per-movie column (e.g. overview); `default` when the catalog lacks it
+        column = self.extra.get(field)
+        return default if column is None else column[index]
+
+def bookkeeping_iloc(movies, index, neighbors):
+    # What recommend() did per request before: Series-building iloc lookups
+    ids = [movies.iloc[i].movie_id for i in neighbors]
+    ids.insert(0, movies.iloc[index].movie_id)
+    titles = [movies.iloc[i].title for i in neighbors]
+    url = f"https://www.themoviedb.org/movie/{movies.iloc[index].movie_id}"
+    return ids, titles, movies.iloc[index].title, url
+
+def bookkeeping_catalog(catalog, index, neighbors):
+    ids = [catalog.movie_id(i) for i in neighbors]
+    ids.insert(0, catalog.movie_id(index))
+    titles = [catalog.title(i) for i in neighbors]
+    url = f"https://www.themoviedb.org/movie/{catalog.movie_id(index)}"
+    return ids, titles, catalog.title(index), url
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request catalog lookups: DataFrame.iloc vs Catalog")
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    from build_artifacts import load_pickle
+    movies = load_pickle(os.path.join(args.data_dir, 'movies.pkl'))
+    start = time.perf_counter()
+    catalog = Catalog.from_movies(movies)
+    build_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    queries = [(int(index), rng.integers(0, len(movies), args.k)) for index in rng.integers(0, len(movies), args.requests)]
+    timings = {}
+    for name, run in (('iloc', lambda q: bookkeeping_iloc(movies, *q)),
+                      ('catalog', lambda q: bookkeeping_catalog(catalog, *q))):
+        start = time.perf_counter()
+        results = [run(query) for query in queries]
+        timings[name] = (time.perf_counter() - start) / len(queries)
+    mismatches = sum(1 for query in queries if bookkeeping_iloc(movies, *query) != bookkeeping_catalog(catalog, *query))
+
+    print(f"Catalog of {len(catalog)} movies built in {build_seconds * 1000:.1f} ms")
+    print(f"Per request (1 + {args.k} movies): iloc {timings['iloc'] * 1e6:.1f} us, "
+          f"catalog {timings['catalog'] * 1e6:.1f} us ({timings['iloc'] / timings['catalog']:.0f}x faster, "
+          f"{mismatches} mismatches)")
+
+if __name__ == "__main__":
+    main()
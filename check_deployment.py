@@ -20,7 +20,7 @@ def check_deployment():
     
     # Check data files
     print("\nChecking data files:")
-    files_to_check = ['movies.pkl', 'movie_list.pkl', 'similarity.pkl', 'app.py']
+    files_to_check = ['movies.pkl', 'movie_list.pkl', 'similarity.pkl', 'similarity.npy', 'app.py']
     for file in files_to_check:
         paths = [
             os.path.join(os.getcwd(), file),
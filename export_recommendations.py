@@ -0,0 +1,166 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import time
+import numpy as np
+from build_artifacts import load_pickle
+from similarity_engine import TAG_VECTORS_NPZ, TagSimilarityEngine, recommend_many
+from similarity_store import SIMILARITY_NPY, open_similarity
+
+# Headless "more like this" export for the whole catalog. Neighbors come
+# straight from the similarity data in vectorised blocks; no TMDB calls.
+
+# Similarity source of the current (worker) process, set by _init_worker
+_similarity = None
+
+def open_similarity_source(data_dir):
+    # Memory-mapped dense matrix if it was built, else the sparse tag engine
+    npy_path = os.path.join(data_dir, SIMILARITY_NPY)
+    if os.path.exists(npy_path):
+        return open_similarity(npy_path)
+    npz_path = os.path.join(data_dir, TAG_VECTORS_NPZ)
+    if os.path.exists(npz_path):
+        return TagSimilarityEngine.load(npz_path)
+    return TagSimilarityEngine.from_tags(load_pickle(os.path.join(data_dir, 'movie_list.pkl'))['tags'])
+
+def _init_worker(data_dir):
+    global _similarity
+    _similarity = open_similarity_source(data_dir)
+
+def _top_k_block(args):
+    start, stop, k = args
+    indices, scores = recommend_many(_similarity, np.arange(start, stop), k=k)
+    return start, indices, scores
+
+def iter_blocks(data_dir, n, k, block_size, workers):
+    tasks = [(start, min(start + block_size, n), k) for start in range(0, n, block_size)]
+    if workers <= 1:
+        _init_worker(data_dir)
+        for task in tasks:
+            yield _top_k_block(task)
+        return
+
+    # Workers open the similarity source themselves; a memory-mapped matrix is
+    # then shared through the page cache instead of being copied into each one
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(data_dir,)) as executor:
+        yield from executor.map(_top_k_block, tasks)
+
+class JsonlWriter:
+    def __init__(self, file_path):
+        self.file = open(file_path, 'w', encoding='utf-8')
+
+    def write_block(self, movie_ids, titles, start, indices, scores):
+        for row, (neighbors, neighbor_scores) in enumerate(zip(indices, scores)):
+            i = start + row
+            record = {
+                'movie_id': int(movie_ids[i]),
+                'title': titles[i],
+                'recommendations': [
+                    {'movie_id': int(movie_ids[j]), 'title': titles[j], 'score': round(float(score), 6)}
+                    for j, score in zip(neighbors, neighbor_scores)
+                ]
+            }
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+class ParquetWriter:
+    def __init__(self, file_path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.schema = pa.schema([
+            ('movie_id', pa.int64()),
+            ('title', pa.string()),
+            ('recommended_movie_ids', pa.list_(pa.int64())),
+            ('recommended_titles', pa.list_(pa.string())),
+            ('scores', pa.list_(pa.float32())),
+        ])
+        self.writer = pq.ParquetWriter(file_path, self.schema)
+
+    def write_block(self, movie_ids, titles, start, indices, scores):
+        pa = self.pa
+        rows = slice(start, start + len(indices))
+        k = indices.shape[1]
+        offsets = np.arange(0, len(indices) * k + 1, k, dtype=np.int32)
+        flat = indices.ravel()
+        table = pa.table({
+            'movie_id': pa.array(movie_ids[rows], pa.int64()),
+            'title': pa.array(list(titles[rows]), pa.string()),
+            'recommended_movie_ids': pa.ListArray.from_arrays(offsets, pa.array(movie_ids[flat], pa.int64())),
+            'recommended_titles': pa.ListArray.from_arrays(offsets, pa.array(list(titles[flat]), pa.string())),
+            'scores': pa.ListArray.from_arrays(offsets, pa.array(scores.ravel(), pa.float32())),
+        }, schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+def peak_rss_mb():
+    # Peak resident set size of this process and of any finished pool workers
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+    return own, children
+
+def export_recommendations(data_dir, output_path, k=10, block_size=512, workers=1, output_format=None):
+    movies = load_pickle(os.path.join(data_dir, 'movies.pkl'))
+    movie_ids = movies['movie_id'].to_numpy()
+    titles = movies['title'].to_numpy(dtype=object)
+
+    output_format = output_format or ('parquet' if output_path.endswith('.parquet') else 'jsonl')
+    writer = ParquetWriter(output_path) if output_format == 'parquet' else JsonlWriter(output_path)
+
+    start_time = time.perf_counter()
+    try:
+        for start, indices, scores in iter_blocks(data_dir, len(movies), k, block_size, workers):
+            writer.write_block(movie_ids, titles, start, indices, scores)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start_time
+
+    own_rss, children_rss = peak_rss_mb()
+    stats = {
+        'titles': len(movies),
+        'k': k,
+        'seconds': elapsed,
+        'titles_per_sec': len(movies) / elapsed if elapsed > 0 else float('inf'),
+        'peak_rss_mb': own_rss,
+        'peak_worker_rss_mb': children_rss if workers > 1 else None,
+    }
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Export top-K similar titles for the whole catalog")
+    parser.add_argument('output', help="Output file (.jsonl or .parquet)")
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--block-size', type=int, default=512)
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes (1 runs in-process)")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default=None)
+    args = parser.parse_args()
+
+    stats = export_recommendations(args.data_dir, args.output, k=args.k, block_size=args.block_size,
+                                   workers=args.workers, output_format=args.format)
+    print(f"Exported {stats['titles']} titles (K={stats['k']}) to {args.output} in {stats['seconds']:.2f}s")
+    print(f"Throughput: {stats['titles_per_sec']:.0f} titles/sec")
+    if stats['peak_rss_mb'] is not None:
+        print(f"Peak RSS: {stats['peak_rss_mb']:.1f} MB")
+    if stats['peak_worker_rss_mb'] is not None:
+        print(f"Peak worker RSS: {stats['peak_worker_rss_mb']:.1f} MB")
+    # Machine-readable line so release-over-release numbers are easy to collect
+    print(json.dumps(stats))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import numpy as np
+
+# Per-movie genres as a bitset (one bit per genre in a uint32 per movie), so
+# "movies in any of these genres" is a single vectorised AND over the catalog
+# instead of looking every movie up on TMDB.
+GENRE_INDEX_NPZ = 'genre_index.npz'
+
+# TMDB genres in the order of their bits
+GENRES = [
+    'Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary',
+    'Drama', 'Family', 'Fantasy', 'Foreign', 'History', 'Horror', 'Music', 'Mystery',
+    'Romance', 'Science Fiction', 'TV Movie', 'Thriller', 'War', 'Western'
+]
+
+# The notebook collapses spaces out of genre names before building tags
+COLLAPSED_GENRES = {genre.replace(' ', ''): genre for genre in GENRES}
+
+def genres_from_tags(tags):
+    # In movie_list.pkl tags are "<overview> <genres> <keywords> <cast> <crew>".
+    # The genre block is the run of genre tokens right after the overview's last
+    # sentence; earlier runs are overview words such as "World War".
+    tokens = tags.split()
+    runs = []
+    start = None
+    for i, token in enumerate(tokens + ['']):
+        if token in COLLAPSED_GENRES:
+            if start is None:
+                start = i
+        elif start is not None:
+            runs.append((start, i))
+            start = None
+    if not runs:
+        return []
+    after_sentence = [run for run in runs if run[0] == 0 or tokens[run[0] - 1][-1] in '.!?"\'”)']
+    start, stop = (after_sentence or runs)[-1]
+    return list(dict.fromkeys(COLLAPSED_GENRES[token] for token in tokens[start:stop]))
+
+class GenreIndex:
+    def __init__(self, bits, genres=GENRES):
+        self.bits = np.asarray(bits, dtype=np.uint32)
+        self.genres = list(genres)
+        self.genre_bit = {genre: np.uint32(1 << i) for i, genre in enumerate(self.genres)}
+
+    @classmethod
+    def from_genre_lists(cls, genre_lists, genres=GENRES):
+        genre_bit = {genre: 1 << i for i, genre in enumerate(genres)}
+        # Accept both display names and the notebook's collapsed names
+        genre_bit.update({genre.replace(' ', ''): bit for genre, bit in list(genre_bit.items())})
+        bits = [sum(genre_bit.get(genre, 0) for genre in set(movie_genres)) for movie_genres in genre_lists]
+        return cls(np.array(bits, dtype=np.uint32), genres)
+
+    @classmethod
+    def from_movie_list(cls, movie_list):
+        # Use the notebook's genres column when it was saved, else recover genres from tags
+        if 'genres' in movie_list.columns:
+            return cls.from_genre_lists(movie_list['genres'])
+        return cls.from_genre_lists(genres_from_tags(tags) for tags in movie_list['tags'])
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path, allow_pickle=False) as data:
+            return cls(data['bits'], [str(genre) for genre in data['genres']])
+
+    def save(self, file_path):
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, bits=self.bits, genres=np.array(self.genres))
+        os.replace(tmp_path, file_path)
+        return file_path
+
+    def __len__(self):
+        return len(self.bits)
+
+    def genre_mask(self, genres):
+        selected = np.uint32(0)
+        for genre in genres:
+            selected |= self.genre_bit.get(genre, np.uint32(0))
+        return selected
+
+    def mask(self, genres):
+        # Boolean array: movies having at least one of the given genres
+        return (self.bits & self.genre_mask(genres)) != 0
+
+    def matching(self, genres, limit=None):
+        indices = np.flatnonzero(self.mask(genres))
+        return indices[:limit] if limit is not None else indices
+
+    def genres_of(self, index):
+        return [genre for genre, bit in self.genre_bit.items() if self.bits[index] & bit]
@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Persistent TMDB metadata cache: one SQLite row per movie_id holding the
+# formatted details as JSON. It survives restarts and is shared by every
+# process pointing at the same file (WAL mode lets readers and a writer
+# overlap), so a warm restart serves previously seen titles without any
+# TMDB traffic. Rows expire after a TTL and the least recently used ones are
+# evicted once the payloads exceed a byte budget.
+METADATA_CACHE_DB = os.environ.get('TMDB_CACHE_PATH', 'tmdb_cache.sqlite')
+CACHE_TTL = float(os.environ.get('TMDB_CACHE_TTL', 7 * 24 * 3600))  # seconds
+CACHE_MAX_BYTES = int(os.environ.get('TMDB_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+class MetadataCache:
+    def __init__(self, file_path=METADATA_CACHE_DB, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.file_path = file_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # One connection shared by the app's threads, serialised by a lock
+        self.connection = sqlite3.connect(file_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS movies ("
+            " movie_id INTEGER PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS movies_accessed ON movies (accessed_at)")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get_many(self, movie_ids):
+        # {movie_id: details} for the ids that are cached and still fresh
+        movie_ids = [int(movie_id) for movie_id in dict.fromkeys(movie_ids)]
+        if not movie_ids:
+            return {}
+        now = time.time()
+        found = {}
+        stale = []
+        with self._lock:
+            for start in range(0, len(movie_ids), 500):  # stay under SQLite's bound-parameter limit
+                chunk = movie_ids[start:start + 500]
+                rows = self.connection.execute(
+                    f"SELECT movie_id, payload, fetched_at FROM movies WHERE movie_id IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                for movie_id, payload, fetched_at in rows:
+                    if now - fetched_at > self.ttl:
+                        stale.append(movie_id)
+                    else:
+                        found[movie_id] = json.loads(payload)
+            if found:
+                self.connection.executemany("UPDATE movies SET accessed_at = ? WHERE movie_id = ?",
+                                            [(now, movie_id) for movie_id in found])
+            if stale:
+                self.connection.executemany("DELETE FROM movies WHERE movie_id = ?", [(movie_id,) for movie_id in stale])
+            self.hits += len(found)
+            self.misses += len(movie_ids) - len(found)
+            self.expired += len(stale)
+        return found
+
+    def get(self, movie_id):
+        return self.get_many([movie_id]).get(int(movie_id))
+
+    def put_many(self, items):
+        # `items` maps movie_id to a JSON-serialisable details dict
+        now = time.time()
+        rows = []
+        for movie_id, details in items.items():
+            payload = json.dumps(details, ensure_ascii=False, separators=(',', ':'))
+            rows.append((int(movie_id), payload, len(payload.encode('utf-8')), now, now))
+        if not rows:
+            return
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO movies (movie_id, payload, size, fetched_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)", rows)
+                self._evict()
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def put(self, movie_id, details):
+        self.put_many({movie_id: details})
+
+    def _evict(self):
+        # Drop least recently used rows until the payloads fit the byte budget
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM movies").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for movie_id, size in self.connection.execute("SELECT movie_id, size FROM movies ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            victims.append((movie_id,))
+            total -= size
+        self.connection.executemany("DELETE FROM movies WHERE movie_id = ?", victims)
+        self.evictions += len(victims)
+
+    def fresh_ids(self):
+        # Ids that would be served from the cache right now, without touching their LRU position
+        with self._lock:
+            rows = self.connection.execute("SELECT movie_id FROM movies WHERE fetched_at >= ?",
+                                           (time.time() - self.ttl,)).fetchall()
+        return {movie_id for movie_id, in rows}
+
+    def __contains__(self, movie_id):
+        with self._lock:
+            row = self.connection.execute("SELECT fetched_at FROM movies WHERE movie_id = ?",
+                                          (int(movie_id),)).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl
+
+    def stats(self):
+        with self._lock:
+            entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM movies").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        self.connection.close()
+
+# In-memory tier in front of the SQLite cache: one process-wide LRU with an
+# entry and a byte budget, so long-running workers stop growing. Failed
+# fetches are remembered for a short while only (negative caching), so a
+# movie TMDB had trouble with is retried soon instead of never.
+MEMORY_CACHE_ENTRIES = int(os.environ.get('TMDB_MEMORY_CACHE_ENTRIES', 5000))
+MEMORY_CACHE_BYTES = int(os.environ.get('TMDB_MEMORY_CACHE_BYTES', 16 * 1024 * 1024))
+NEGATIVE_TTL = float(os.environ.get('TMDB_NEGATIVE_TTL', 60))  # seconds
+
+class MemoryCache:
+    def __init__(self, max_entries=MEMORY_CACHE_ENTRIES, max_bytes=MEMORY_CACHE_BYTES, negative_ttl=NEGATIVE_TTL,
+                 ttl=None):
+        # `ttl` optionally expires successful entries too (seconds; None keeps them until evicted)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.negative_ttl = negative_ttl
+        self.ttl = ttl
+        # key -> (value, size, expires_at); value None marks a failed fetch
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        # (True, value) on a hit, where value is None for a remembered failure; (False, None) on a miss
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            if entry[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value):
+        # Sized by its JSON encoding, the same bytes the SQLite tier stores
+        size = len(json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str))
+        self._store(key, value, size, time.monotonic() + self.ttl if self.ttl is not None else None)
+
+    def put_failure(self, key):
+        self._store(key, None, 0, time.monotonic() + self.negative_ttl)
+
+    def _store(self, key, value, size, expires_at):
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, size, expires_at)
+            self.bytes += size
+            while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            }
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the persistent TMDB metadata cache")
+    parser.add_argument('--path', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), METADATA_CACHE_DB))
+    parser.add_argument('--clear', action='store_true', help="Delete every cached movie")
+    args = parser.parse_args()
+
+    cache = MetadataCache(args.path)
+    if args.clear:
+        with cache._lock:
+            cache.connection.execute("DELETE FROM movies")
+    for name, value in cache.stats().items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
+    cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from build_artifacts import load_pickle
+from metadata_cache import METADATA_CACHE_DB, MetadataCache
+from tmdb_client import MAX_CONCURRENCY, RATE_LIMIT, TMDB_API_URL, AsyncTMDBClient, TokenBucket
+
+# Offline warm-up of the TMDB metadata cache for the whole catalog, so the app
+# starts with every movie's details on disk instead of fetching them live.
+# Details are written in batches; ids already cached (and fresh) are skipped,
+# so an interrupted run picks up where it stopped when started again.
+BATCH_SIZE = 200
+
+async def prefetch(movie_ids, cache, client, batch_size=BATCH_SIZE, progress=True):
+    stats = {'fetched': 0, 'failed': 0, 'failures': {}}
+    try:
+        for start in range(0, len(movie_ids), batch_size):
+            batch = movie_ids[start:start + batch_size]
+            results = await asyncio.gather(*(client.movie_details(movie_id) for movie_id in batch),
+                                           return_exceptions=True)
+            fetched = {}
+            for movie_id, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    stats['failed'] += 1
+                    stats['failures'][str(movie_id)] = f"{type(result).__name__}: {result}"
+                else:
+                    fetched[movie_id] = result
+            # Committed per batch, so an interruption loses at most one batch
+            cache.put_many(fetched)
+            stats['fetched'] += len(fetched)
+            if progress:
+                print(f"{start + len(batch)}/{len(movie_ids)} fetched ({stats['failed']} failed)", flush=True)
+    finally:
+        await client.close()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch TMDB details for every movie into the local metadata cache")
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--cache', default=None, help=f"Metadata cache file (default: <data-dir>/{METADATA_CACHE_DB})")
+    parser.add_argument('--rate', type=float, default=RATE_LIMIT, help="Requests per second (0 for unlimited)")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY, help="Requests in flight at once")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--limit', type=int, default=None, help="Only the first N movies of the catalog")
+    parser.add_argument('--refresh', action='store_true', help="Refetch movies that are already cached")
+    parser.add_argument('--base-url', default=TMDB_API_URL, help="Point at another server (e.g. a local stub)")
+    args = parser.parse_args()
+
+    movies = load_pickle(os.path.join(args.data_dir, 'movies.pkl'))
+    movie_ids = [int(movie_id) for movie_id in dict.fromkeys(movies['movie_id'][:args.limit])]
+    cache = MetadataCache(args.cache or os.path.join(args.data_dir, METADATA_CACHE_DB))
+
+    # Resume: anything still fresh in the cache was fetched by an earlier run
+    cached = set() if args.refresh else cache.fresh_ids()
+    todo = [movie_id for movie_id in movie_ids if movie_id not in cached]
+    print(f"{len(movie_ids)} movies, {len(movie_ids) - len(todo)} already cached, {len(todo)} to fetch")
+
+    client = AsyncTMDBClient(base_url=args.base_url, pool_size=args.concurrency, max_concurrency=args.concurrency,
+                             rate_limiter=TokenBucket(args.rate) if args.rate > 0 else None)
+    start = time.perf_counter()
+    try:
+        stats = asyncio.run(prefetch(todo, cache, client, batch_size=args.batch_size))
+    except KeyboardInterrupt:
+        print("Interrupted; completed batches are saved, run again to resume")
+        return
+    elapsed = time.perf_counter() - start
+
+    requests_made = client.stats()['requests']
+    print(f"Fetched {stats['fetched']} movies with {requests_made} requests in {elapsed:.2f}s "
+          f"({requests_made / elapsed if elapsed > 0 else 0:.1f} requests/sec, {stats['failed']} failed)")
+    for movie_id, error in list(stats['failures'].items())[:10]:
+        print(f"  movie {movie_id}: {error}")
+    cache_stats = cache.stats()
+    print(f"Cache: {cache_stats['entries']} movies, {cache_stats['bytes'] / 1024 / 1024:.1f} MB")
+    cache.close()
+    print(json.dumps({
+        'movies': len(movie_ids),
+        'skipped': len(movie_ids) - len(todo),
+        'fetched': stats['fetched'],
+        'failed': stats['failed'],
+        'requests': requests_made,
+        'seconds': elapsed,
+        'requests_per_sec': requests_made / elapsed if elapsed > 0 else None,
+    }))
+
+if __name__ == "__main__":
+    main()
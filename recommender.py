@@ -0,0 +1,574 @@
+import os
+import stat
+import threading
+import time
+import numpy as np
+from artifact_bundle import BUNDLE_FILE, BundleError, check_recommender_bundle, open_bundle
+from catalog import Catalog
+from genre_index import GENRE_INDEX_NPZ, GenreIndex
+from metadata_cache import METADATA_CACHE_DB, MemoryCache, MetadataCache
+from result_cache import ResultCache, result_key
+from similarity_engine import TAG_VECTORS_NPZ, TagSimilarityEngine, recommend_many
+from similarity_store import NEIGHBORS_NPZ, SIMILARITY_NPY, load_neighbors, neighbor_row, open_similarity
+from title_search import TitleAutocomplete, TitleSearchIndex
+
+# The recommendation service without any UI: artifact loading, title lookup,
+# similarity ranking, genre filtering and TMDB detail hydration. The Streamlit
+# app and the HTTP API (api.py) are both thin clients of Recommender. Problems
+# are reported through a `warn(message)` callback (st.warning in the app, a log
+# line in the API) instead of being drawn here.
+#
+# Importing this module is cheap (numpy and the small local modules): joblib,
+# pandas (via the pickles), scipy and the TMDB client's aiohttp/requests are
+# imported on first use, normally by the RecommenderLoader warm-up thread.
+# With recommender.bundle (build_artifacts.py) no pickle is read at all.
+ARTIFACTS = (BUNDLE_FILE, 'movies.pkl', 'movie_list.pkl', NEIGHBORS_NPZ, TAG_VECTORS_NPZ, GENRE_INDEX_NPZ,
+             SIMILARITY_NPY, 'similarity.pkl')
+
+def check_file_access(file_path):
+    try:
+        # Check if file exists
+        if not os.path.exists(file_path):
+            return False, "File does not exist"
+
+        # Check file permissions
+        file_stat = os.stat(file_path)
+        if not (file_stat.st_mode & stat.S_IRUSR):
+            return False, "File is not readable"
+
+        # Check file size
+        if os.path.getsize(file_path) == 0:
+            return False, "File is empty"
+
+        return True, "File is accessible"
+    except Exception as e:
+        return False, f"Error checking file: {str(e)}"
+
+def find_data_file(filename, data_dir=None):
+    # Possible locations where the file might be
+    possible_paths = [
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), filename),
+        os.path.join(os.getcwd(), filename),
+        os.path.join('/mount/src/movie-recommendation', filename),
+        filename
+    ]
+    if data_dir is not None:
+        possible_paths.insert(0, os.path.join(data_dir, filename))
+
+    for path in possible_paths:
+        if os.path.exists(path):
+            return path
+
+    return None
+
+def file_version(filename, data_dir=None):
+    # Changes whenever the file is rewritten or replaced, so callers caching a
+    # loaded artifact know when to load it again
+    file_path = find_data_file(filename, data_dir)
+    if file_path is None:
+        return None
+    file_stat = os.stat(file_path)
+    return (file_path, file_stat.st_mtime_ns, file_stat.st_size)
+
+def artifact_versions(data_dir=None):
+    return tuple(file_version(filename, data_dir) for filename in ARTIFACTS)
+
+def safe_load_data(filename, data_dir=None, warn=None):
+    # Legacy pickles, only read when there is no artifact bundle. joblib.load reads
+    # both joblib dumps and plain pickles, so a file is parsed at most once.
+    try:
+        file_path = find_data_file(filename, data_dir)
+        if file_path is None:
+            return None
+
+        import joblib
+        return joblib.load(file_path)
+    except Exception as e:
+        if warn is not None:
+            warn(f"Failed to load {filename}")
+        return None
+
+def load_bundle(data_dir=None, warn=None):
+    # The artifact bundle from build_artifacts.py, validated once; None when it is
+    # missing or unusable (the pickles are loaded instead)
+    file_path = find_data_file(BUNDLE_FILE, data_dir)
+    if file_path is None:
+        return None
+    try:
+        bundle = open_bundle(file_path)
+        problems = check_recommender_bundle(bundle)
+    except (OSError, BundleError) as e:
+        problems = [str(e)]
+    if problems:
+        if warn is not None:
+            warn(f"Ignoring {BUNDLE_FILE} ({problems[0]}), loading the pickles instead")
+        return None
+    return bundle
+
+def bundle_tag_engine(bundle):
+    # The stored tag vectors are already normalised; the CSR matrix shares the mapped buffers
+    from scipy import sparse
+    vectors = sparse.csr_matrix((bundle['tag_data'], bundle['tag_indices'], bundle['tag_indptr']),
+                                shape=tuple(bundle.metadata['tag_shape']), copy=False)
+    return TagSimilarityEngine.from_normalized(vectors)
+
+def load_similarity(data_dir=None, warn=None, unpickle=True):
+    # Prefer the memory-mapped matrix; unpickle similarity.pkl only when it is missing
+    # (and `unpickle` allows it)
+    npy_path = find_data_file(SIMILARITY_NPY, data_dir)
+    if npy_path is not None:
+        try:
+            return open_similarity(npy_path)
+        except Exception as e:
+            if warn is not None:
+                warn(f"Could not map {SIMILARITY_NPY}, falling back to the other similarity sources")
+    return safe_load_data('similarity.pkl', data_dir, warn) if unpickle else None
+
+def load_neighbor_table(data_dir=None, warn=None):
+    # Compact top-K table built by build_artifacts.py; None when it hasn't been built
+    npz_path = find_data_file(NEIGHBORS_NPZ, data_dir)
+    if npz_path is None:
+        return None
+    try:
+        return load_neighbors(npz_path)
+    except Exception as e:
+        if warn is not None:
+            warn(f"Could not load {NEIGHBORS_NPZ}, falling back to the similarity matrix")
+        return None
+
+def load_tag_engine(movie_list, data_dir=None, warn=None, refit=True):
+    # Sparse tag vectors replace the dense matrix; rebuilt from movie_list.pkl if not
+    # prebuilt (and `refit` allows it: that costs seconds and the sklearn import)
+    try:
+        npz_path = find_data_file(TAG_VECTORS_NPZ, data_dir)
+        if npz_path is not None:
+            return TagSimilarityEngine.load(npz_path)
+        return TagSimilarityEngine.from_tags(movie_list['tags']) if refit else None
+    except Exception as e:
+        if warn is not None:
+            warn("Could not build the tag similarity engine, falling back to similarity.pkl")
+        return None
+
+def load_genre_index(movie_list, data_dir=None, warn=None):
+    # Genre bitsets from build_artifacts.py, or recovered from the movie_list.pkl tags
+    npz_path = find_data_file(GENRE_INDEX_NPZ, data_dir)
+    if npz_path is not None:
+        try:
+            return GenreIndex.load(npz_path)
+        except Exception as e:
+            if warn is not None:
+                warn(f"Could not load {GENRE_INDEX_NPZ}, rebuilding it from movie_list.pkl")
+    return GenreIndex.from_movie_list(movie_list)
+
+def build_title_indexes(catalog):
+    # Exact-title dict, trigram index for fuzzy lookups and the prefix index
+    # feeding autocompletion
+    movie_index = {}
+    for idx, title in enumerate(catalog.lower_titles):
+        movie_index[title] = idx
+    title_search_index = TitleSearchIndex(movie_index.keys())
+
+    # Rank suggestions by popularity when the catalog has it, else by catalog order
+    popularity = next((catalog.extra[field] for field in ('popularity', 'vote_count') if catalog.has(field)), None)
+    title_autocomplete = TitleAutocomplete(catalog.titles, scores=popularity)
+    return movie_index, title_search_index, title_autocomplete
+
+def open_metadata_cache(warn=None):
+    # On-disk TMDB details shared by every process; None if the file can't be opened
+    try:
+        return MetadataCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), METADATA_CACHE_DB))
+    except Exception as e:
+        if warn is not None:
+            warn(f"Could not open the TMDB metadata cache, fetching details without it. Error: {str(e)}")
+        return None
+
+def movie_card(title, details):
+    return {
+        'title': title,
+        'poster': details['poster'],
+        'overview': details['overview'],
+        'release_date': details['release_date'],
+        'vote_average': details['vote_average'],
+        'tmdb_url': details['tmdb_url'],
+        'trailer_key': details['trailer_key'],
+        'budget': details['budget'],
+        'revenue': details['revenue'],
+        'runtime': details['runtime'],
+        'genres': details['genres'],
+        'main_cast': details['main_cast']
+    }
+
+class Recommender:
+    def __init__(self, catalog, movie_list=None, neighbors=None, similarity=None, genre_index=None, title_indexes=None,
+                 details_cache=None, metadata_cache=None, result_cache=None, data_dir=None, tag_engine_loader=None):
+        # Needs `neighbors` or `similarity` (a matrix or a TagSimilarityEngine), and
+        # `genre_index` when there is no `movie_list` to rebuild it from.
+        # `tag_engine_loader()` loads the tag vectors when they are first needed.
+        self.catalog = catalog
+        self.movie_list = movie_list
+        self.neighbors = neighbors
+        self.similarity = similarity
+        self.genre_index = genre_index if genre_index is not None else GenreIndex.from_movie_list(movie_list)
+        self.movie_index, self.title_search_index, self.title_autocomplete = (
+            title_indexes if title_indexes is not None else build_title_indexes(catalog))
+        self.details_cache = details_cache if details_cache is not None else MemoryCache()
+        self.metadata_cache = metadata_cache
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        self.data_dir = data_dir
+        # Artifact versions this recommender was loaded from; part of every result cache key
+        self.version = None
+        self.load_timings = {}
+        self._tag_engine = similarity if isinstance(similarity, TagSimilarityEngine) else None
+        self._tag_engine_loader = tag_engine_loader or (lambda: load_tag_engine(self.movie_list, self.data_dir))
+        self._tag_engine_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, data_dir=None, details_cache=None, metadata_cache=None, result_cache=None, warn=None):
+        # Everything from the artifact files; None when required files are missing.
+        # `load_timings` on the result records how long each step took.
+        # Versions are read first, so a file replaced mid-load triggers another reload.
+        version = artifact_versions(data_dir)
+        timings = {}
+        def timed(step, load):
+            start = time.perf_counter()
+            result = load()
+            timings[step] = time.perf_counter() - start
+            return result
+
+        bundle = timed(BUNDLE_FILE, lambda: load_bundle(data_dir, warn))
+        if bundle is not None:
+            # Zero-copy views of the mapped bundle; only titles are decoded
+            catalog = timed('catalog', lambda: Catalog.from_bundle(bundle))
+            title_indexes = timed('title_indexes', lambda: build_title_indexes(catalog))
+            recommender = cls(catalog, neighbors=(bundle['neighbor_indices'], bundle['neighbor_scores']),
+                              genre_index=GenreIndex(bundle['genre_bits'], bundle.metadata['genres']),
+                              title_indexes=title_indexes, details_cache=details_cache,
+                              metadata_cache=metadata_cache, result_cache=result_cache, data_dir=data_dir,
+                              tag_engine_loader=lambda: bundle_tag_engine(bundle))
+            recommender.version = version
+            recommender.load_timings = timings
+            return recommender
+
+        # Without a bundle: the pickles and whichever separate artifacts exist
+        movies = timed('movies.pkl', lambda: safe_load_data('movies.pkl', data_dir, warn))
+        movie_list = timed('movie_list.pkl', lambda: safe_load_data('movie_list.pkl', data_dir, warn))
+        if movies is None or movie_list is None:
+            return None
+        neighbors = timed('neighbors', lambda: load_neighbor_table(data_dir, warn))
+        # Without a neighbor table, cheapest source first: prebuilt tag vectors, the
+        # memory-mapped similarity.npy, tag vectors refitted from movie_list.pkl, and
+        # unpickling similarity.pkl last
+        similarity = None
+        if neighbors is None:
+            similarity = timed('tag_engine', lambda: load_tag_engine(movie_list, data_dir, warn, refit=False))
+        if neighbors is None and similarity is None:
+            similarity = timed('similarity', lambda: load_similarity(data_dir, warn, unpickle=False))
+        if neighbors is None and similarity is None:
+            similarity = timed('tag_engine', lambda: load_tag_engine(movie_list, data_dir, warn))
+        if neighbors is None and similarity is None:
+            similarity = timed('similarity', lambda: safe_load_data('similarity.pkl', data_dir, warn))
+        if neighbors is None and similarity is None:
+            return None
+        genre_index = timed('genre_index', lambda: load_genre_index(movie_list, data_dir, warn))
+        catalog = timed('catalog', lambda: Catalog.from_movies(movies))
+        title_indexes = timed('title_indexes', lambda: build_title_indexes(catalog))
+        recommender = cls(catalog, movie_list, neighbors, similarity, genre_index=genre_index,
+                          title_indexes=title_indexes, details_cache=details_cache, metadata_cache=metadata_cache,
+                          result_cache=result_cache, data_dir=data_dir)
+        recommender.version = version
+        recommender.load_timings = timings
+        return recommender
+
+    def tag_engine(self):
+        # Loaded on first use: only needed when the stored neighbors can't fill k
+        with self._tag_engine_lock:
+            if self._tag_engine is None:
+                self._tag_engine = self._tag_engine_loader()
+            return self._tag_engine
+
+    def iter_movie_details(self, movie_ids, warn=None):
+        # Yields (position, details) for every movie id as soon as its details are
+        # known: the in-memory cache first, then the on-disk cache, and the rest as
+        # they arrive from the shared async client's event loop. Failed movies yield
+        # None and are reported through `warn`.
+        positions = {}
+        for position, movie_id in enumerate(movie_ids):
+            positions.setdefault(int(movie_id), []).append(position)
+
+        missing = []
+        for movie_id in positions:
+            hit, details = self.details_cache.lookup(movie_id)
+            if hit:
+                for position in positions[movie_id]:
+                    yield position, details
+            else:
+                missing.append(movie_id)
+
+        if missing and self.metadata_cache is not None:
+            cached = self.metadata_cache.get_many(missing)
+            for movie_id, details in cached.items():
+                self.details_cache.put(movie_id, details)
+                for position in positions[movie_id]:
+                    yield position, details
+            missing = [movie_id for movie_id in missing if movie_id not in cached]
+
+        if missing:
+            from tmdb_client import iter_movie_details_many
+            fetched = {}
+            try:
+                for i, result in iter_movie_details_many(missing):
+                    movie_id = missing[i]
+                    if isinstance(result, Exception):
+                        # Remembered briefly so a failing movie isn't refetched on every request
+                        self.details_cache.put_failure(movie_id)
+                        if warn is not None:
+                            warn(f"Warning: Could not fetch details for movie ID {movie_id}. Error: {str(result)}")
+                        result = None
+                    else:
+                        self.details_cache.put(movie_id, result)
+                        fetched[movie_id] = result
+                    for position in positions[movie_id]:
+                        yield position, result
+            finally:
+                if fetched and self.metadata_cache is not None:
+                    self.metadata_cache.put_many(fetched)
+
+    def fetch_movie_details_batch(self, movie_ids, warn=None):
+        # All details at once, in the order of `movie_ids`
+        results = [None] * len(movie_ids)
+        for position, details in self.iter_movie_details(movie_ids, warn):
+            results[position] = details
+        return results
+
+    def fetch_movie_details(self, movie_id, warn=None):
+        return self.fetch_movie_details_batch([movie_id], warn)[0]
+
+    def find_movie_index(self, movie_name):
+        # (index, matched title) where the title is set only for a fuzzy match; (None, None) if nothing matches
+        movie_name = movie_name.lower().strip()
+
+        # First try exact match
+        if movie_name in self.movie_index:
+            return self.movie_index[movie_name], None
+
+        # If no exact match, find similar titles (minimum similarity 0.8)
+        best_match, best_score = self.title_search_index.best_match(movie_name)
+
+        if best_match:
+            return self.movie_index[best_match], best_match
+
+        return None, None
+
+    def similar_movie_indices(self, index, k=10, allowed=None):
+        # Top-k most similar movies, restricted to the boolean `allowed` mask when given
+        if self.neighbors is not None:
+            # Neighbors are stored presorted, so this is a (filtered) slice of the table
+            top_indices, _ = neighbor_row(self.neighbors, index, k, mask=allowed)
+            if len(top_indices) >= k:
+                return top_indices
+            # Too few stored neighbors (k exceeds the table's width, or too few match
+            # the genres); rank the full row instead
+            source = self.tag_engine()
+            if source is None:
+                return top_indices
+        else:
+            source = self.similarity
+        # Partial top-k selection over the similarity row, excluding the movie itself
+        top_indices, top_scores = recommend_many(source, [index], k, mask=allowed)
+        return top_indices[0][np.isfinite(top_scores[0])]
+
+    def searched_movie_card(self, index, details):
+        # The searched movie is shown even when its details can't be fetched
+        catalog = self.catalog
+        searched_movie = {
+            'title': catalog.title(index),
+            'poster': None,
+            'overview': catalog.field('overview', index, 'No description available'),
+            'release_date': catalog.field('release_date', index, 'N/A'),
+            'vote_average': catalog.field('vote_average', index, 'N/A'),
+            'tmdb_url': f"https://www.themoviedb.org/movie/{catalog.movie_id(index)}",
+            'trailer_key': None,
+            'budget': 'Not available',
+            'revenue': 'Not available',
+            'runtime': 'Not available',
+            'genres': [],
+            'main_cast': []
+        }
+        if details:
+            searched_movie.update(details)
+        return searched_movie
+
+    def recommendation_rows(self, index, genres=None, k=10):
+        # Catalog rows to show, in similarity order: the searched movie (when it passes
+        # the genre filter) followed by its k most similar movies. The genre filter is
+        # applied while ranking, so only movies that will be shown are fetched.
+        allowed = self.genre_index.mask(genres) if genres else None
+        rows = [int(i) for i in self.similar_movie_indices(index, k, allowed)]
+        if allowed is None or allowed[index]:
+            rows.insert(0, int(index))
+        return rows
+
+    def iter_cards(self, rows, searched=None, warn=None):
+        # Yields (position, card, fetched) for every row as its details arrive; card is
+        # None for a recommendation whose details failed to load
+        catalog = self.catalog
+        for position, details in self.iter_movie_details([catalog.movie_id(row) for row in rows], warn):
+            row = rows[position]
+            if row == searched:
+                yield position, self.searched_movie_card(row, details), details is not None
+            elif details:
+                yield position, movie_card(catalog.title(row), details), True
+            else:
+                yield position, None, False
+
+    def build_cards(self, rows, searched=None, warn=None):
+        # The cards for `rows` in order, and whether every movie's details could be fetched
+        cards = [None] * len(rows)
+        complete = True
+        for position, card, fetched in self.iter_cards(rows, searched, warn):
+            cards[position] = card
+            complete = complete and fetched
+        return [card for card in cards if card is not None], complete
+
+    def build_recommendations(self, index, genres=None, k=10, warn=None):
+        # The full recommendation list in similarity order, and whether every movie's
+        # details could be fetched
+        return self.build_cards(self.recommendation_rows(index, genres, k), searched=index, warn=warn)
+
+    def build_genre_browse(self, genres, k=10, warn=None, build_cards=None):
+        # Up to k movies having any of the genres; TMDB is only asked about movies that
+        # will be shown. `build_cards(rows)` lets the app render each batch as it loads.
+        build_cards = build_cards or (lambda rows: self.build_cards(rows, warn=warn))
+        recommended_movies = []
+        complete = True
+        matching = self.genre_index.matching(genres)
+        position = 0
+        while len(recommended_movies) < k and position < len(matching):
+            # Just enough candidates to fill k slots; another batch only runs if some fail
+            batch = [int(i) for i in matching[position:position + k - len(recommended_movies)]]
+            position += len(batch)
+            cards, batch_complete = build_cards(batch)
+            recommended_movies.extend(cards)
+            complete = complete and batch_complete
+        return recommended_movies, complete
+
+    def recommend(self, title=None, genres=None, k=10, warn=None):
+        # One request: {'match', 'movie_id', 'results'} for `title` (or genre-only
+        # browsing without a title), served from the shared result cache when possible.
+        # None when the title matches nothing in the catalog.
+        genres = list(genres or [])
+        if title:
+            index, match = self.find_movie_index(title)
+            if index is None:
+                return None
+            key = result_key(index, genres, k, self.version)
+            results = self.result_cache.get_or_compute(key, lambda: self.build_recommendations(index, genres, k, warn))
+            return {
+                'match': self.catalog.title(index),
+                'fuzzy': match is not None,
+                'movie_id': self.catalog.movie_id(index),
+                'results': results,
+            }
+        results = self.result_cache.get_or_compute(result_key(None, genres, k, self.version),
+                                                   lambda: self.build_genre_browse(genres, k, warn))
+        return {'match': None, 'fuzzy': False, 'movie_id': None, 'results': results}
+
+    def precompute(self, indices):
+        # Fill the result cache for `indices` (e.g. the most popular titles) ahead of demand
+        keys = [result_key(index, version=self.version) for index in indices]
+        self.result_cache.precompute(keys, lambda key: self.build_recommendations(key[0], list(key[1]), key[2]))
+
+    def stats(self):
+        from tmdb_client import get_async_client
+        return {
+            'movies': len(self.catalog),
+            'recommendation_results': self.result_cache.stats(),
+            'movie_details_memory': self.details_cache.stats(),
+            'movie_details_disk': self.metadata_cache.stats() if self.metadata_cache is not None else None,
+            'tmdb': get_async_client().stats(),
+        }
+
+class RecommenderLoader:
+    # Loads the Recommender on a background thread, so a process can serve its
+    # first page (or health check) before the artifacts are in memory. Callers
+    # that need it wait(); current() returns it without blocking, or None while
+    # it is still loading. A changed artifact file starts a reload in the
+    # background and the previous recommender is served until it finishes.
+    # Problems found by the latest load are kept in `warnings`; `warn(message)`
+    # is also called once for each, as the load finds it.
+    def __init__(self, data_dir=None, details_cache=None, metadata_cache=None, result_cache=None, warn=None):
+        self.data_dir = data_dir
+        self.warn = warn
+        self.load_kwargs = {'details_cache': details_cache, 'metadata_cache': metadata_cache,
+                            'result_cache': result_cache}
+        self.created = time.perf_counter()
+        self.recommender = None
+        self.version = None
+        self.warnings = []
+        self.failed = False
+        self.ready_seconds = None
+        self.import_seconds = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._loading = None
+        self.start()
+
+    def start(self):
+        with self._lock:
+            if self._loading is None or not self._loading.is_alive():
+                self._loading = threading.Thread(target=self._load, name='recommender-warmup', daemon=True)
+                self._loading.start()
+
+    def _load(self):
+        warnings = []
+        def warn(message):
+            warnings.append(message)
+            if self.warn is not None:
+                self.warn(message)
+
+        recommender = None
+        import_seconds = None
+        start = time.perf_counter()
+        try:
+            # The TMDB client (aiohttp) is imported here, off the request
+            # path; pandas and joblib only when there is no bundle and pickles are read
+            import tmdb_client
+            import_seconds = time.perf_counter() - start
+            recommender = Recommender.load(self.data_dir, warn=warn, **self.load_kwargs)
+        except Exception as e:
+            warn(f"Error loading data files: {str(e)}")
+        with self._lock:
+            self.import_seconds = import_seconds
+            self.warnings = warnings
+            if recommender is not None:
+                self.recommender = recommender
+                self.version = recommender.version
+            self.failed = self.recommender is None
+            if self.ready_seconds is None:
+                self.ready_seconds = time.perf_counter() - self.created
+        self._ready.set()
+
+    def current(self):
+        # The loaded recommender (None while loading); reloads if an artifact file changed
+        recommender = self.recommender
+        if recommender is not None and artifact_versions(self.data_dir) != self.version:
+            self.start()
+        return recommender
+
+    def wait(self, timeout=None):
+        # Block until the first load finished; None if it failed (see `warnings`)
+        self._ready.wait(timeout)
+        return self.current()
+
+    def ready(self):
+        return self._ready.is_set()
+
+    def stats(self):
+        recommender = self.recommender
+        return {
+            'ready': self.ready(),
+            'failed': self.failed,
+            'ready_seconds': self.ready_seconds,
+            'import_seconds': self.import_seconds,
+            'load_seconds': recommender.load_timings if recommender is not None else None,
+        }
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+from metadata_cache import MemoryCache
+
+# Whole-result cache for recommend(): the final list of movie cards per
+# (resolved movie index, sorted genre filter, k, artifact version), shared by
+# every session in the process. A hit skips ranking and detail hydration
+# entirely. The version keeps lists computed from replaced artifacts (where the
+# same index may be another movie) from being served after a reload; entries
+# expire after a TTL so TMDB-side changes (ratings, posters) still show up.
+RESULT_CACHE_ENTRIES = int(os.environ.get('RESULT_CACHE_ENTRIES', 2000))
+RESULT_CACHE_BYTES = int(os.environ.get('RESULT_CACHE_BYTES', 64 * 1024 * 1024))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 3600))  # seconds
+# Most popular titles whose (unfiltered) recommendations are computed at startup
+PRECOMPUTE_TOP_N = int(os.environ.get('RESULT_PRECOMPUTE_TOP_N', 50))
+LATENCY_SAMPLES = 1000
+
+def result_key(index, genres=None, k=10, version=None):
+    # index is None for genre-only browsing; version identifies the artifacts the index refers to
+    return (None if index is None else int(index), tuple(sorted(genres or ())), k, version)
+
+class ResultCache:
+    def __init__(self, max_entries=RESULT_CACHE_ENTRIES, max_bytes=RESULT_CACHE_BYTES, ttl=RESULT_CACHE_TTL):
+        self.cache = MemoryCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        self._lock = threading.Lock()
+        # Recent end-to-end latencies (seconds) of lookups served from the cache and of computed ones
+        self.latencies = {'hit': deque(maxlen=LATENCY_SAMPLES), 'miss': deque(maxlen=LATENCY_SAMPLES)}
+        self.precomputed = 0
+
+    def lookup(self, key):
+        return self.cache.lookup(key)
+
+    def store(self, key, results, cacheable=True):
+        # Incomplete results (e.g. some details failed to load) are served but not cached
+        if results and cacheable:
+            self.cache.put(key, results)
+
+    def record(self, hit, seconds):
+        # End-to-end latency of one request, served from the cache or computed
+        with self._lock:
+            self.latencies['hit' if hit else 'miss'].append(seconds)
+
+    def get_or_compute(self, key, compute):
+        # `compute()` returns (results, cacheable)
+        start = time.perf_counter()
+        hit, results = self.lookup(key)
+        if not hit:
+            results, cacheable = compute()
+            self.store(key, results, cacheable)
+        self.record(hit, time.perf_counter() - start)
+        return results
+
+    def precompute(self, keys, compute):
+        # Fill the cache ahead of demand, e.g. for the most popular titles at startup
+        for key in keys:
+            try:
+                results, cacheable = compute(key)
+            except Exception:
+                continue
+            if results and cacheable:
+                self.cache.put(key, results)
+                with self._lock:
+                    self.precomputed += 1
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats['precomputed'] = self.precomputed
+        with self._lock:
+            for kind, samples in self.latencies.items():
+                values = np.array(samples) * 1000 if samples else None
+                stats[f'{kind}_p50_ms'] = float(np.percentile(values, 50)) if values is not None else None
+                stats[f'{kind}_p95_ms'] = float(np.percentile(values, 95)) if values is not None else None
+        return stats
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+
+# L2-normalised sparse tag vectors (one CSR row per movie). Cosine similarity
+# between two movies is then a plain dot product, so a query only needs one
+# sparse mat-vec instead of a precomputed N x N matrix.
+TAG_VECTORS_NPZ = 'tag_vectors.npz'
+
+def normalize_rows(vectors):
+    # scipy is imported on first use, keeping it off the import path of the app
+    from scipy import sparse
+    vectors = sparse.csr_matrix(vectors, dtype=np.float64)
+    norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0  # movies without tags keep an all-zero row
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ vectors)
+
+class TagSimilarityEngine:
+    def __init__(self, vectors):
+        self.vectors = normalize_rows(vectors)
+
+    @classmethod
+    def from_tags(cls, tags, max_features=5000):
+        # Same vectoriser settings as the notebook that produced similarity.pkl
+        from sklearn.feature_extraction.text import CountVectorizer
+        cv = CountVectorizer(max_features=max_features, stop_words='english')
+        return cls(cv.fit_transform(tags))
+
+    @classmethod
+    def from_normalized(cls, vectors):
+        # Vectors that are already L2-normalised CSR (e.g. views of an artifact bundle) are used as is
+        engine = cls.__new__(cls)
+        engine.vectors = vectors
+        return engine
+
+    @classmethod
+    def load(cls, file_path):
+        from scipy import sparse
+        return cls(sparse.load_npz(file_path))
+
+    def save(self, file_path):
+        from scipy import sparse
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            sparse.save_npz(f, self.vectors)
+        os.replace(tmp_path, file_path)
+        return file_path
+
+    @property
+    def shape(self):
+        return (self.vectors.shape[0], self.vectors.shape[0])
+
+    def similarity_row(self, index):
+        query = self.vectors[index].toarray().ravel()
+        return self.vectors @ query
+
+    def similarity_rows(self, indices):
+        queries = self.vectors[indices].toarray()
+        return (self.vectors @ queries.T).T
+
+    def __getitem__(self, index):
+        # Lets the engine stand in for the dense matrix (e.g. in recommend_many)
+        if isinstance(index, slice):
+            return self.similarity_rows(np.arange(self.vectors.shape[0])[index])
+        if np.ndim(index) > 0:
+            return self.similarity_rows(np.asarray(index))
+        return self.similarity_row(index)
+
+def top_k_block(block, query_indices, k, mask=None):
+    # Top-K columns of each row of a (queries x N) similarity block, best first,
+    # never returning the query itself. argpartition is O(N) per row and only
+    # the K survivors get sorted. Columns outside the boolean `mask` are ruled
+    # out before selection; if fewer than K remain, the tail scores are -inf.
+    block = np.array(block, dtype=np.float64)
+    if mask is not None:
+        block[:, ~mask] = -np.inf
+    rows = np.arange(block.shape[0])
+    block[rows, query_indices] = -np.inf
+
+    k = min(k, block.shape[1] - 1)
+    part = np.argpartition(block, -k, axis=1)[:, -k:]
+    part_scores = np.take_along_axis(block, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    return (np.take_along_axis(part, order, axis=1).astype(np.int32),
+            np.take_along_axis(part_scores, order, axis=1).astype(np.float32))
+
+def recommend_many(similarity, indices, k=10, block_size=512, mask=None):
+    # Batched recommendations for many movies at once. `similarity` is anything
+    # that returns a 2-D block of rows for an index array: the dense matrix, its
+    # memory map or a TagSimilarityEngine. Returns (indices, scores) arrays of
+    # shape (len(indices), k) sorted by descending score. An optional boolean
+    # `mask` over the catalog restricts which movies may be recommended.
+    indices = np.asarray(indices, dtype=np.int64).ravel()
+    k = min(k, similarity.shape[0] - 1)
+    top_indices = np.empty((len(indices), k), dtype=np.int32)
+    top_scores = np.empty((len(indices), k), dtype=np.float32)
+
+    for start in range(0, len(indices), block_size):
+        batch = indices[start:start + block_size]
+        top_indices[start:start + len(batch)], top_scores[start:start + len(batch)] = top_k_block(
+            similarity[batch], batch, k, mask=mask)
+
+    return top_indices, top_scores
@@ -0,0 +1,67 @@
+import os
+import numpy as np
+from similarity_engine import recommend_many
+
+# Raw .npy copy of the similarity matrix. Unlike similarity.pkl it can be
+# memory-mapped, so every worker process shares one page-cache copy and
+# only the rows that are actually read get paged in.
+SIMILARITY_NPY = 'similarity.npy'
+
+def save_similarity(matrix, file_path, dtype=None):
+    matrix = np.ascontiguousarray(matrix, dtype=dtype)
+    if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+        raise ValueError(f"Similarity matrix must be square, got shape {matrix.shape}")
+
+    # Write to a temporary file first so workers never map a half-written file
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, matrix, allow_pickle=False)
+    os.replace(tmp_path, file_path)
+    return file_path
+
+def open_similarity(file_path):
+    matrix = np.load(file_path, mmap_mode='r', allow_pickle=False)
+    if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+        raise ValueError(f"{file_path} does not contain a square similarity matrix")
+    return matrix
+
+def similarity_row(matrix, index):
+    # Copies a single row out of the mapping; the rest of the file stays on disk
+    return np.array(matrix[index])
+
+# Precomputed top-K neighbor table: int32 indices and float32 scores per
+# movie, sorted by descending similarity with the movie itself excluded.
+# At K=50 it is roughly 100x smaller than the dense matrix.
+NEIGHBORS_NPZ = 'similarity_topk.npz'
+DEFAULT_TOP_K = 50
+
+def top_k_neighbors(matrix, k=DEFAULT_TOP_K, block_size=512):
+    return recommend_many(matrix, np.arange(matrix.shape[0]), k=k, block_size=block_size)
+
+def save_neighbors(file_path, indices, scores):
+    if indices.shape != scores.shape:
+        raise ValueError("Neighbor indices and scores must have the same shape")
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, indices=indices.astype(np.int32), scores=scores.astype(np.float32))
+    os.replace(tmp_path, file_path)
+    return file_path
+
+def load_neighbors(file_path):
+    with np.load(file_path, allow_pickle=False) as data:
+        indices = data['indices']
+        scores = data['scores']
+    if indices.ndim != 2 or indices.shape != scores.shape:
+        raise ValueError(f"{file_path} does not contain a valid neighbor table")
+    return indices, scores
+
+def neighbor_row(neighbors, index, k=10, mask=None):
+    # With a boolean `mask` over the catalog, only allowed neighbors are kept.
+    # Fewer than k come back when the table holds too few of them, including
+    # when k is larger than the number of neighbors stored per movie.
+    indices, scores = neighbors
+    row, row_scores = indices[index], scores[index]
+    if mask is not None:
+        keep = mask[row]
+        row, row_scores = row[keep], row_scores[keep]
+    return row[:k], row_scores[:k]
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Startup-time report: what importing app.py's modules costs (a `python -X
+# importtime` run grouped by top-level package), what the warm-up thread
+# imports later, and how long each artifact takes to load. Imports are timed
+# in fresh interpreters so nothing is already cached in sys.modules.
+APP_IMPORTS = ['streamlit', 'metadata_cache', 'recommender', 'result_cache']
+WARMUP_IMPORTS = ['tmdb_client']
+# Only imported when there is no recommender.bundle and the pickles are read
+PICKLE_IMPORTS = ['joblib', 'pandas', 'scipy.sparse']
+
+def import_times(modules, cwd):
+    # ({top-level package: seconds of its own import time}, wall seconds) for importing `modules`
+    statement = '; '.join(f'import {module}' for module in modules)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=cwd, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    packages = {}
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1e6
+    return packages, wall
+
+def print_packages(title, packages, top):
+    print(f"{title}: {sum(packages.values()) * 1000:.1f} ms")
+    for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<24} {seconds * 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Report where app startup time goes: imports and artifact loads")
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--top', type=int, default=10, help="Packages listed per section")
+    args = parser.parse_args()
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, here)
+    from artifact_bundle import BUNDLE_FILE
+    from recommender import RecommenderLoader, find_data_file
+    warmup_imports = WARMUP_IMPORTS if find_data_file(BUNDLE_FILE, args.data_dir) else WARMUP_IMPORTS + PICKLE_IMPORTS
+
+    _, baseline = import_times([], here)
+    app_packages, app_wall = import_times(APP_IMPORTS, here)
+    all_packages, _ = import_times(APP_IMPORTS + warmup_imports, here)
+    # Whatever the app's own imports didn't pull in is paid on the warm-up thread
+    warmup_packages = {package: seconds for package, seconds in all_packages.items() if package not in app_packages}
+
+    print(f"Interpreter start: {baseline * 1000:.1f} ms")
+    print_packages(f"Imports before the first page (wall {app_wall * 1000:.1f} ms)", app_packages, args.top)
+    print_packages("Imports deferred to the warm-up thread", warmup_packages, args.top)
+
+    start = time.perf_counter()
+    loader = RecommenderLoader(args.data_dir)
+    recommender = loader.wait()
+    ready = time.perf_counter() - start
+    for warning in loader.warnings:
+        print(f"Warning: {warning}")
+    if recommender is None:
+        print("Failed to load required data files. Please check the data files.")
+        return
+    print(f"Warm-up (imports + artifacts): {ready * 1000:.1f} ms")
+    for step, seconds in recommender.load_timings.items():
+        print(f"  {step:<24} {seconds * 1000:8.1f} ms")
+
+    print(json.dumps({
+        'interpreter_seconds': baseline,
+        'app_import_seconds': app_wall,
+        'app_imports': app_packages,
+        'warmup_imports': warmup_packages,
+        'warmup_seconds': ready,
+        'artifact_seconds': recommender.load_timings,
+    }))
+
+if __name__ == "__main__":
+    main()
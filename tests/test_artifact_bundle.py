@@ -0,0 +1,231 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+from artifact_bundle import (
+    ALIGNMENT, BUNDLE_FILE, HEADER, SCHEMA_VERSION, BundleError, check_recommender_bundle, encode_strings,
+    open_bundle, write_bundle
+)
+from build_artifacts import build_bundle
+from genre_index import GENRE_INDEX_NPZ, GenreIndex
+from recommender import Recommender, load_bundle
+from similarity_engine import TAG_VECTORS_NPZ, TagSimilarityEngine
+from similarity_store import NEIGHBORS_NPZ, save_neighbors, top_k_neighbors
+
+def sample_arrays():
+    title_buffer, title_offsets = encode_strings(['Avatar', 'Amélie', ''])
+    return {
+        'ids': np.array([19995, 194, 7], dtype=np.int32),
+        'matrix': np.arange(12, dtype=np.float32).reshape(3, 4),
+        'big_endian': np.array([1, 2, 3], dtype='>i8'),
+        'empty': np.zeros(0, dtype=np.float64),
+        'title_buffer': title_buffer,
+        'title_offsets': title_offsets,
+    }
+
+@pytest.fixture
+def bundle_path(tmp_path):
+    return write_bundle(str(tmp_path / 'sample.bundle'), sample_arrays(), metadata={'movies': 3})
+
+def read_manifest(file_path):
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    _, manifest_offset, manifest_length = HEADER.unpack_from(data, 0)
+    return data, manifest_offset, json.loads(data[manifest_offset:manifest_offset + manifest_length])
+
+def rewrite_manifest(file_path, change):
+    # Edit the stored manifest in place, keeping the header consistent with it
+    data, manifest_offset, manifest = read_manifest(file_path)
+    change(manifest)
+    payload = json.dumps(manifest).encode('utf-8')
+    with open(file_path, 'wb') as f:
+        f.write(HEADER.pack(data[:8], manifest_offset, len(payload)))
+        f.write(data[HEADER.size:manifest_offset])
+        f.write(payload)
+
+def flip_byte(file_path, offset):
+    with open(file_path, 'r+b') as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+def truncate(file_path, size):
+    with open(file_path, 'r+b') as f:
+        f.truncate(size)
+
+def test_round_trip(bundle_path):
+    bundle = open_bundle(bundle_path)
+    for name, array in sample_arrays().items():
+        assert np.array_equal(bundle[name], array)
+        assert bundle[name].shape == array.shape
+    assert bundle['big_endian'].dtype.str == '<i8'
+    assert bundle.strings('title') == ['Avatar', 'Amélie', '']
+    assert bundle.metadata == {'movies': 3}
+    assert bundle.manifest['schema_version'] == SCHEMA_VERSION
+
+def test_arrays_are_read_only_aligned_views(bundle_path):
+    bundle = open_bundle(bundle_path)
+    matrix = bundle['matrix']
+    assert not matrix.flags.writeable
+    assert matrix.base is not None
+    with pytest.raises(ValueError):
+        matrix[0, 0] = 1
+    for entry in bundle.manifest['arrays'].values():
+        assert entry['offset'] % ALIGNMENT == 0
+
+def test_flipped_data_byte_fails_checksum(bundle_path):
+    _, _, manifest = read_manifest(bundle_path)
+    flip_byte(bundle_path, manifest['arrays']['matrix']['offset'] + 5)
+    with pytest.raises(BundleError, match='Checksum mismatch for array matrix'):
+        open_bundle(bundle_path)
+    # Structure is intact, so an unverified open still works (verify_file_format.py reports per array)
+    assert open_bundle(bundle_path, verify=False)['matrix'].shape == (3, 4)
+
+def test_flipped_magic_is_not_a_bundle(bundle_path):
+    flip_byte(bundle_path, 0)
+    with pytest.raises(BundleError, match='not an artifact bundle'):
+        open_bundle(bundle_path)
+
+@pytest.mark.parametrize('keep', [1, 2, 0.5])
+def test_truncated_bundle_is_rejected(bundle_path, keep):
+    data, _, _ = read_manifest(bundle_path)
+    truncate(bundle_path, len(data) - keep if isinstance(keep, int) else int(len(data) * keep))
+    with pytest.raises(BundleError, match='truncated'):
+        open_bundle(bundle_path)
+
+def test_file_shorter_than_header_is_rejected(bundle_path):
+    truncate(bundle_path, 10)
+    with pytest.raises(BundleError, match='too small'):
+        open_bundle(bundle_path)
+
+def test_trailing_data_is_rejected(bundle_path):
+    with open(bundle_path, 'ab') as f:
+        f.write(b'\0')
+    with pytest.raises(BundleError, match='trailing data'):
+        open_bundle(bundle_path)
+
+def test_unreadable_manifest_is_rejected(bundle_path):
+    _, manifest_offset, _ = read_manifest(bundle_path)
+    flip_byte(bundle_path, manifest_offset)
+    with pytest.raises(BundleError, match='Unreadable manifest'):
+        open_bundle(bundle_path)
+
+def test_manifest_that_is_not_an_object_is_rejected(bundle_path):
+    data, manifest_offset, _ = read_manifest(bundle_path)
+    with open(bundle_path, 'wb') as f:
+        f.write(HEADER.pack(data[:8], manifest_offset, 2))
+        f.write(data[HEADER.size:manifest_offset])
+        f.write(b'[]')
+    with pytest.raises(BundleError, match='not a JSON object'):
+        open_bundle(bundle_path)
+
+@pytest.mark.parametrize('version', [SCHEMA_VERSION - 1, SCHEMA_VERSION + 1, None])
+def test_other_schema_version_is_rejected(bundle_path, version):
+    rewrite_manifest(bundle_path, lambda manifest: manifest.update(schema_version=version))
+    with pytest.raises(BundleError, match='schema version'):
+        open_bundle(bundle_path)
+
+@pytest.mark.parametrize('change, message', [
+    (lambda entry: entry.update(shape=[4, 4]), "don't match"),
+    (lambda entry: entry.update(dtype='|O'), "don't match"),
+    (lambda entry: entry.update(offset=entry['offset'] + 1), 'outside the data section'),
+    (lambda entry: entry.update(offset=0), 'outside the data section'),
+    (lambda entry: entry.update(offset=entry['offset'] + 10 * ALIGNMENT), 'outside the data section'),
+    (lambda entry: entry.pop('crc32'), 'Bad manifest entry'),
+])
+def test_inconsistent_manifest_entry_is_rejected(bundle_path, change, message):
+    rewrite_manifest(bundle_path, lambda manifest: change(manifest['arrays']['matrix']))
+    with pytest.raises(BundleError, match=message):
+        open_bundle(bundle_path)
+
+TAGS = [
+    'blue people on a distant moon Action Adventure ScienceFiction',
+    'a shy waitress in paris Comedy Romance',
+    'marines on a distant moon fight aliens Action ScienceFiction',
+    'paris cafe romance Romance Drama',
+    'aliens invade a moon base Action ScienceFiction',
+    'a waitress falls in love in paris Comedy Romance',
+]
+
+@pytest.fixture
+def data_dir(tmp_path):
+    # A six-movie catalog with the pickles and every artifact build_bundle needs
+    titles = ['Avatar', 'Amélie', 'Aliens', 'Before Sunrise', 'Moon Base', 'Chocolat']
+    movies = pd.DataFrame({'movie_id': [19995, 194, 679, 76, 1000, 392], 'title': titles, 'tags': TAGS})
+    movies.to_pickle(tmp_path / 'movies.pkl')
+    movies.to_pickle(tmp_path / 'movie_list.pkl')
+
+    vocabulary = sorted({word for tags in TAGS for word in tags.lower().split()})
+    rows, columns = zip(*[(row, vocabulary.index(word)) for row, tags in enumerate(TAGS)
+                          for word in set(tags.lower().split())])
+    engine = TagSimilarityEngine(sparse.csr_matrix((np.ones(len(rows)), (rows, columns)),
+                                                   shape=(len(TAGS), len(vocabulary))))
+    engine.save(str(tmp_path / TAG_VECTORS_NPZ))
+    save_neighbors(str(tmp_path / NEIGHBORS_NPZ), *top_k_neighbors(engine, k=3))
+    GenreIndex.from_movie_list(movies).save(str(tmp_path / GENRE_INDEX_NPZ))
+    build_bundle(str(tmp_path), str(tmp_path / BUNDLE_FILE))
+    return tmp_path
+
+def test_built_bundle_passes_recommender_checks(data_dir):
+    bundle = open_bundle(str(data_dir / BUNDLE_FILE))
+    assert check_recommender_bundle(bundle) == []
+    assert 'tag_buffer' not in bundle
+    assert bundle.strings('title')[1] == 'Amélie'
+
+def test_recommender_check_reports_missing_and_inconsistent_arrays(data_dir, tmp_path):
+    bundle = open_bundle(str(data_dir / BUNDLE_FILE))
+    arrays = {name: np.array(bundle[name]) for name in bundle.manifest['arrays'] if name != 'genre_bits'}
+    arrays['neighbor_indices'][0, 0] = len(arrays['movie_ids'])
+    path = write_bundle(str(tmp_path / 'broken.bundle'), arrays, bundle.metadata)
+    assert check_recommender_bundle(open_bundle(path)) == ['missing array genre_bits']
+
+    arrays['genre_bits'] = np.array(bundle['genre_bits'])
+    path = write_bundle(str(tmp_path / 'broken.bundle'), arrays, bundle.metadata)
+    assert check_recommender_bundle(open_bundle(path)) == ['neighbor_indices point outside the catalog']
+
+def test_recommender_prefers_the_bundle(data_dir):
+    warnings = []
+    recommender = Recommender.load(str(data_dir), warn=warnings.append)
+    assert warnings == []
+    assert recommender.movie_list is None
+    assert BUNDLE_FILE in recommender.load_timings
+    assert 'movies.pkl' not in recommender.load_timings
+
+def corrupt_data(file_path):
+    _, _, manifest = read_manifest(file_path)
+    flip_byte(file_path, manifest['arrays']['neighbor_indices']['offset'])
+
+def corrupt_length(file_path):
+    data, _, _ = read_manifest(file_path)
+    truncate(file_path, len(data) // 2)
+
+def corrupt_version(file_path):
+    rewrite_manifest(file_path, lambda manifest: manifest.update(schema_version=SCHEMA_VERSION + 1))
+
+@pytest.mark.parametrize('corrupt, reason', [
+    (corrupt_data, 'Checksum mismatch'),
+    (corrupt_length, 'truncated'),
+    (corrupt_version, 'schema version'),
+])
+def test_unusable_bundle_falls_back_to_the_pickles(data_dir, corrupt, reason):
+    # Answers from the intact bundle, taken before it is corrupted in place (its arrays are views of the file)
+    intact = Recommender.load(str(data_dir))
+    titles = list(intact.catalog.titles)
+    queries = [(index, genres) for index in range(len(titles)) for genres in (None, ['Romance'])]
+    expected = [intact.recommendation_rows(index, genres, 3) for index, genres in queries]
+    corrupt(str(data_dir / BUNDLE_FILE))
+
+    warnings = []
+    assert load_bundle(str(data_dir), warn=warnings.append) is None
+    recommender = Recommender.load(str(data_dir), warn=warnings.append)
+    assert recommender is not None
+    assert recommender.movie_list is not None
+    assert 'movies.pkl' in recommender.load_timings
+    assert len(warnings) == 2
+    assert all(f'Ignoring {BUNDLE_FILE}' in warning and reason in warning for warning in warnings)
+
+    # Same catalog and the same answers as from the intact bundle
+    assert list(recommender.catalog.titles) == titles
+    assert [recommender.recommendation_rows(index, genres, 3) for index, genres in queries] == expected
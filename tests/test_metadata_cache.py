@@ -0,0 +1,215 @@
+import sqlite3
+import pytest
+import metadata_cache
+from metadata_cache import MemoryCache, MetadataCache
+
+def details(title, padding=0):
+    return {'title': title, 'overview': 'x' * padding}
+
+def payload_size(value):
+    return len(metadata_cache.json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+def memory_size(value):
+    return len(metadata_cache.json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str))
+
+@pytest.fixture
+def memory_clock(clock, monkeypatch):
+    monkeypatch.setattr(metadata_cache, 'time', clock)
+    return clock
+
+def test_memory_cache_hit_and_miss():
+    cache = MemoryCache()
+    assert cache.lookup('a') == (False, None)
+    cache.put('a', details('A'))
+    assert cache.lookup('a') == (True, details('A'))
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 1, 1)
+    assert stats['bytes'] == memory_size(details('A'))
+    assert stats['hit_ratio'] == pytest.approx(0.5)
+
+def test_memory_cache_evicts_least_recently_used_beyond_entry_budget():
+    cache = MemoryCache(max_entries=3)
+    for key in 'abc':
+        cache.put(key, details(key))
+    # A lookup refreshes 'a', so 'b' is the oldest
+    cache.lookup('a')
+    cache.put('d', details('d'))
+    assert list(cache.entries) == ['c', 'a', 'd']
+    assert cache.lookup('b') == (False, None)
+    assert cache.stats()['evictions'] == 1
+
+def test_memory_cache_evicts_beyond_byte_budget():
+    value = details('A', padding=50)
+    cache = MemoryCache(max_entries=100, max_bytes=3 * memory_size(value))
+    for key in 'abc':
+        cache.put(key, details('A', padding=50))
+    assert len(cache) == 3
+    cache.put('d', details('A', padding=50 + memory_size(value)))
+    assert list(cache.entries) == ['c', 'd']
+    assert cache.bytes == memory_size(value) + memory_size(details('A', padding=50 + memory_size(value)))
+    assert cache.bytes <= cache.max_bytes
+    assert cache.stats()['evictions'] == 2
+
+def test_memory_cache_drops_value_larger_than_byte_budget():
+    cache = MemoryCache(max_bytes=10)
+    cache.put('a', details('A', padding=100))
+    assert cache.lookup('a') == (False, None)
+    assert (len(cache), cache.bytes) == (0, 0)
+
+def test_memory_cache_replacing_a_key_updates_its_size():
+    cache = MemoryCache()
+    cache.put('a', details('A', padding=100))
+    cache.put('a', details('A'))
+    assert len(cache) == 1
+    assert cache.bytes == memory_size(details('A'))
+
+def test_memory_cache_failures_expire_after_negative_ttl(memory_clock):
+    cache = MemoryCache(negative_ttl=60)
+    cache.put_failure('a')
+    memory_clock.advance(60)
+    assert cache.lookup('a') == (True, None)
+    memory_clock.advance(1)
+    assert cache.lookup('a') == (False, None)
+    stats = cache.stats()
+    assert (stats['entries'], stats['negative_hits'], stats['misses']) == (0, 1, 1)
+
+def test_memory_cache_failures_cost_no_bytes_but_count_as_entries():
+    cache = MemoryCache(max_entries=2)
+    cache.put('a', details('A'))
+    cache.put_failure('b')
+    assert cache.bytes == memory_size(details('A'))
+    cache.put_failure('c')
+    assert list(cache.entries) == ['b', 'c']
+
+def test_memory_cache_success_replaces_remembered_failure(memory_clock):
+    cache = MemoryCache(negative_ttl=60)
+    cache.put_failure('a')
+    cache.put('a', details('A'))
+    memory_clock.advance(3600)
+    assert cache.lookup('a') == (True, details('A'))
+
+def test_memory_cache_optional_ttl_expires_values(memory_clock):
+    cache = MemoryCache(ttl=10)
+    cache.put('a', details('A'))
+    memory_clock.advance(10)
+    assert cache.lookup('a') == (True, details('A'))
+    memory_clock.advance(1)
+    assert cache.lookup('a') == (False, None)
+    assert cache.bytes == 0
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'tmdb_cache.sqlite')
+
+@pytest.fixture
+def disk_cache(cache_path, clock, monkeypatch):
+    monkeypatch.setattr(metadata_cache, 'time', clock)
+    cache = MetadataCache(cache_path, ttl=100, max_bytes=10_000)
+    yield cache
+    cache.close()
+
+def test_round_trip_and_counters(disk_cache):
+    disk_cache.put_many({1: details('A'), 2: details('B')})
+    assert disk_cache.get_many([1, 2, 3]) == {1: details('A'), 2: details('B')}
+    assert disk_cache.get('1') == details('A')
+    stats = disk_cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (2, 3, 1)
+    assert stats['bytes'] == payload_size(details('A')) + payload_size(details('B'))
+
+def test_entries_expire_after_ttl(disk_cache, clock):
+    disk_cache.put(1, details('A'))
+    clock.advance(100)
+    assert 1 in disk_cache
+    assert disk_cache.fresh_ids() == {1}
+    assert disk_cache.get(1) == details('A')
+
+    clock.advance(1)
+    assert 1 not in disk_cache
+    assert disk_cache.fresh_ids() == set()
+    assert disk_cache.get(1) is None
+    stats = disk_cache.stats()
+    # The stale row is deleted on the read that found it
+    assert (stats['entries'], stats['expired']) == (0, 1)
+
+def test_refetch_resets_ttl(disk_cache, clock):
+    disk_cache.put(1, details('old'))
+    clock.advance(90)
+    disk_cache.put(1, details('new'))
+    clock.advance(90)
+    assert disk_cache.get(1) == details('new')
+    assert disk_cache.stats()['entries'] == 1
+
+def test_evicts_least_recently_used_by_bytes(cache_path, clock, monkeypatch):
+    monkeypatch.setattr(metadata_cache, 'time', clock)
+    row = details('A', padding=100)
+    cache = MetadataCache(cache_path, ttl=1000, max_bytes=3 * payload_size(row))
+    try:
+        for movie_id in (1, 2, 3):
+            cache.put(movie_id, details('A', padding=100))
+            clock.advance(1)
+        # Reading 1 makes 2 the least recently used
+        assert cache.get(1) is not None
+        clock.advance(1)
+        cache.put(4, details('A', padding=100))
+        assert set(cache.get_many([1, 2, 3, 4])) == {1, 3, 4}
+        assert cache.stats()['evictions'] == 1
+
+        # One large row pushes out as many old ones as it takes to fit
+        clock.advance(1)
+        cache.put(5, details('A', padding=250))
+        stats = cache.stats()
+        assert stats['bytes'] <= cache.max_bytes
+        assert cache.fresh_ids() == {5}
+        assert stats['evictions'] == 4
+    finally:
+        cache.close()
+
+def test_row_larger_than_budget_is_not_kept(cache_path):
+    cache = MetadataCache(cache_path, max_bytes=10)
+    try:
+        cache.put(1, details('A', padding=100))
+        assert cache.get(1) is None
+        assert cache.stats()['bytes'] == 0
+    finally:
+        cache.close()
+
+def test_reopen_keeps_rows_in_wal_mode(cache_path):
+    cache = MetadataCache(cache_path)
+    cache.put_many({movie_id: details(str(movie_id)) for movie_id in range(10)})
+    assert cache.connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    cache.close()
+
+    reopened = MetadataCache(cache_path)
+    try:
+        assert reopened.connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert reopened.get_many(range(10)) == {movie_id: details(str(movie_id)) for movie_id in range(10)}
+        assert reopened.stats()['entries'] == 10
+    finally:
+        reopened.close()
+
+def test_second_connection_sees_committed_rows(cache_path):
+    # Two processes sharing the file: each write is visible to the other's next read
+    writer = MetadataCache(cache_path)
+    reader = MetadataCache(cache_path)
+    try:
+        assert reader.get(1) is None
+        writer.put(1, details('A'))
+        assert reader.get(1) == details('A')
+        reader.put(2, details('B'))
+        assert writer.get(2) == details('B')
+    finally:
+        writer.close()
+        reader.close()
+
+def test_reopen_after_unclosed_connection(cache_path):
+    # A worker killed without close() leaves the WAL behind; the next open recovers its rows
+    cache = MetadataCache(cache_path)
+    cache.put(1, details('A'))
+    reopened = MetadataCache(cache_path)
+    try:
+        assert reopened.get(1) == details('A')
+        rows = sqlite3.connect(cache_path).execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+        assert rows == 1
+    finally:
+        reopened.close()
+        cache.close()
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from catalog import Catalog
+from genre_index import GenreIndex
+from recommender import Recommender
+from similarity_engine import TagSimilarityEngine, recommend_many, top_k_block
+from similarity_store import neighbor_row, top_k_neighbors
+
+N = 8
+
+@pytest.fixture(scope='module')
+def engine():
+    rng = np.random.default_rng(3)
+    return TagSimilarityEngine(sparse.csr_matrix(rng.random((N, 12)) * (rng.random((N, 12)) < 0.6)))
+
+@pytest.fixture(scope='module')
+def dense(engine):
+    return (engine.vectors @ engine.vectors.T).toarray()
+
+def expected_order(dense, index, allowed=None):
+    # Reference ranking: every other (allowed) movie by descending similarity
+    candidates = [j for j in range(N) if j != index and (allowed is None or allowed[j])]
+    return sorted(candidates, key=lambda j: -dense[index, j])
+
+def test_query_is_never_returned(dense):
+    queries = np.arange(N)
+    top, scores = top_k_block(dense[queries], queries, k=N - 1)
+    for query in queries:
+        assert query not in top[query]
+        assert list(top[query]) == expected_order(dense, query)
+    # Even when the mask allows it and it is the only allowed movie
+    only_self = np.zeros(N, dtype=bool)
+    only_self[2] = True
+    top, scores = recommend_many(dense, [2], k=3, mask=only_self)
+    assert 2 not in top[0][np.isfinite(scores[0])]
+    assert not np.isfinite(scores[0]).any()
+
+def test_mask_restricts_ranking(dense, engine):
+    allowed = np.array([True, False, True, False, True, False, True, False])
+    for similarity in (dense, engine):
+        top, scores = recommend_many(similarity, np.arange(N), k=2, mask=allowed)
+        for query in range(N):
+            assert list(top[query]) == expected_order(dense, query, allowed)[:2]
+            assert np.all(np.diff(scores[query]) <= 0)
+
+def test_fewer_allowed_than_k_leaves_minus_inf_tail(dense):
+    allowed = np.zeros(N, dtype=bool)
+    allowed[[1, 5]] = True
+    top, scores = recommend_many(dense, [0], k=5, mask=allowed)
+    assert list(top[0][:2]) == expected_order(dense, 0, allowed)
+    assert np.isfinite(scores[0][:2]).all() and np.isneginf(scores[0][2:]).all()
+
+def test_neighbor_row_filters_and_clamps(dense):
+    table = recommend_many(dense, np.arange(N), k=4)
+    row, row_scores = neighbor_row(table, 0, k=2)
+    assert list(row) == expected_order(dense, 0)[:2]
+    allowed = np.zeros(N, dtype=bool)
+    allowed[expected_order(dense, 0)[3]] = True
+    assert list(neighbor_row(table, 0, k=2, mask=allowed)[0]) == [expected_order(dense, 0)[3]]
+    # k wider than the table: whatever it stores
+    assert len(neighbor_row(table, 0, k=10)[0]) == 4
+
+def make_recommender(engine, dense=None, neighbors=None, tag_engine=True):
+    catalog = Catalog(np.arange(100, 100 + N), [f'Movie {i}' for i in range(N)])
+    # Movies 0-3 are Action, 4-7 Comedy, 1 and 6 also Drama
+    genre_index = GenreIndex.from_genre_lists([['Action'], ['Action', 'Drama'], ['Action'], ['Action'],
+                                               ['Comedy'], ['Comedy'], ['Comedy', 'Drama'], ['Comedy']])
+    return Recommender(catalog, neighbors=neighbors, similarity=dense, genre_index=genre_index,
+                       tag_engine_loader=(lambda: engine) if tag_engine else (lambda: None))
+
+def test_genre_filter_returns_only_finite_results(engine, dense):
+    recommender = make_recommender(engine, dense=dense)
+    allowed = recommender.genre_index.mask(['Drama'])
+    rows = recommender.similar_movie_indices(0, k=5, allowed=allowed)
+    assert list(rows) == expected_order(dense, 0, allowed) == [1, 6]
+    # The query itself passing the filter is still not among its neighbors
+    assert list(recommender.similar_movie_indices(1, k=5, allowed=allowed)) == [6]
+    assert recommender.recommendation_rows(1, ['Drama'], 5) == [1, 6]
+
+def test_narrow_genre_filter_falls_back_to_the_tag_engine(engine, dense):
+    recommender = make_recommender(engine, neighbors=top_k_neighbors(engine, k=2))
+    allowed = recommender.genre_index.mask(['Comedy'])
+    rows = recommender.similar_movie_indices(0, k=3, allowed=allowed)
+    assert list(rows) == expected_order(dense, 0, allowed)[:3]
+
+def test_k_wider_than_the_table_falls_back_to_the_tag_engine(engine, dense):
+    recommender = make_recommender(engine, neighbors=top_k_neighbors(engine, k=2))
+    assert list(recommender.similar_movie_indices(0, k=2)) == expected_order(dense, 0)[:2]
+    assert list(recommender.similar_movie_indices(0, k=5)) == expected_order(dense, 0)[:5]
+    # Without tag vectors the table's rows are all there is
+    recommender = make_recommender(engine, neighbors=top_k_neighbors(engine, k=2), tag_engine=False)
+    assert list(recommender.similar_movie_indices(0, k=5)) == expected_order(dense, 0)[:2]
@@ -0,0 +1,67 @@
+import random
+import pytest
+from difflib import SequenceMatcher
+from title_search import (
+    CACHE_MIN_RANGE, FUZZY_THRESHOLD, TitleAutocomplete, TitleSearchIndex, linear_best_match, misspell
+)
+
+TITLES = [
+    'avatar', 'the dark knight', 'the dark knight rises', 'batman begins', 'toy storm', 'toy stork',
+    'toy story', 'toy story 2', 'the matrix', 'the matrix reloaded', 'alien', 'aliens', 'up', 'heat',
+    'abcdef', 'amélie', 'star wars', 'star trek', 'the godfather', 'the godfather: part ii',
+]
+
+@pytest.fixture(scope='module')
+def index():
+    return TitleSearchIndex(TITLES)
+
+def test_exact_title(index):
+    assert index.best_match('the dark knight') == ('the dark knight', 1.0)
+
+def test_tie_goes_to_the_earliest_title(index):
+    # 'toy storm' and 'toy stork' score the same against 'toy storx'
+    assert SequenceMatcher(None, 'toy storx', 'toy storm').ratio() == SequenceMatcher(None, 'toy storx', 'toy stork').ratio()
+    assert index.best_match('toy storx') == linear_best_match('toy storx', TITLES)
+    assert index.best_match('toy storx')[0] == 'toy storm'
+    reversed_titles = ['toy stork', 'toy storm']
+    assert TitleSearchIndex(reversed_titles).best_match('toy storx')[0] == 'toy stork'
+
+def test_score_of_exactly_the_threshold_is_not_a_match(index):
+    # 'abcd' vs 'abcdef' scores 2 * 4 / 10 = 0.8: the length bound cuts it off, as the scan's strict > does
+    assert SequenceMatcher(None, 'abcd', 'abcdef').ratio() == FUZZY_THRESHOLD
+    assert linear_best_match('abcd', TITLES) == (None, 0)
+    assert index.best_match('abcd') == (None, 0)
+    assert len(index.shortlist('abcd')) == 0
+
+def test_just_above_the_threshold_matches(index):
+    assert index.best_match('abcde') == linear_best_match('abcde', TITLES) == ('abcdef', pytest.approx(10 / 11))
+
+def test_no_match(index):
+    assert index.best_match('zzzzqqqq') == (None, 0)
+    assert linear_best_match('zzzzqqqq', TITLES) == (None, 0)
+    assert index.best_match('') == (None, 0)
+
+def test_misspellings_match_the_linear_scan(index):
+    rng = random.Random(7)
+    for _ in range(300):
+        query = misspell(rng.choice(TITLES), rng)
+        assert index.best_match(query) == linear_best_match(query, TITLES), query
+
+def test_autocomplete_puts_the_exact_title_first():
+    autocomplete = TitleAutocomplete(['The Dark Knight Rises', 'Batman Begins', 'The Dark Knight', 'Dark Knight'])
+    assert autocomplete.complete('the dark knight') == ['The Dark Knight', 'The Dark Knight Rises']
+    assert autocomplete.complete('THE DARK KNIGHT ')[0] == 'The Dark Knight'
+    # Without an exact title, whole-title prefixes lead, then later-word matches, each in rank order
+    assert autocomplete.complete('dark kn') == ['Dark Knight', 'The Dark Knight Rises', 'The Dark Knight']
+    assert autocomplete.complete('the dark knight', limit=1) == ['The Dark Knight']
+
+def test_autocomplete_exact_title_first_for_precomputed_prefixes():
+    titles = [f'Up {i}' for i in range(CACHE_MIN_RANGE + 1)] + ['Up']
+    autocomplete = TitleAutocomplete(titles)
+    assert 'up' in autocomplete.cache
+    assert autocomplete.complete('up')[:2] == ['Up', 'Up 0']
+
+def test_autocomplete_has_nothing_for_typos():
+    # The app falls back to TitleSearchIndex.best_match for these
+    assert TitleAutocomplete(['Avatar']).complete('avatr') == []
+    assert TitleSearchIndex(['avatar']).best_match('avatr')[0] == 'avatar'
@@ -0,0 +1,295 @@
+import asyncio
+import aiohttp
+import pytest
+import tmdb_client
+from tmdb_client import AsyncTMDBClient, TokenBucket
+
+@pytest.fixture
+def bucket_clock(clock, monkeypatch):
+    monkeypatch.setattr(tmdb_client, 'time', clock)
+    return clock
+
+def test_bucket_allows_burst_then_spaces_requests(bucket_clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.1, 0.2, 0.3])
+    stats = bucket.stats()
+    assert stats['throttled_requests'] == 3
+    assert stats['throttle_wait_seconds'] == pytest.approx(0.6)
+
+def test_bucket_refills_at_rate(bucket_clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    for _ in range(5):
+        bucket.reserve()
+    bucket_clock.advance(0.3)
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.0] * 3, abs=1e-9)
+    assert bucket.reserve() == pytest.approx(0.1)
+
+def test_bucket_refill_is_capped_at_burst(bucket_clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    bucket_clock.advance(3600)
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    assert bucket.reserve() == pytest.approx(0.1)
+
+def test_zero_rate_never_delays(bucket_clock):
+    bucket = TokenBucket(rate=0, burst=2)
+    assert [bucket.reserve() for _ in range(10)] == [0.0] * 10
+    assert bucket.stats()['throttled_requests'] == 0
+
+def test_rate_limit_env_zero_disables_shared_bucket(monkeypatch):
+    monkeypatch.setattr(tmdb_client, '_rate_limiter', None)
+    monkeypatch.setattr(tmdb_client, 'RATE_LIMIT', 0.0)
+    assert tmdb_client.get_rate_limiter() is None
+    monkeypatch.setattr(tmdb_client, 'RATE_LIMIT', 40.0)
+    assert tmdb_client.get_rate_limiter().rate == 40.0
+
+def test_bucket_pays_back_reserved_debt(bucket_clock):
+    # Waiting callers already hold their tokens: after the wait the balance is back at zero, not refilled
+    bucket = TokenBucket(rate=10, burst=2)
+    delays = [bucket.reserve() for _ in range(4)]
+    bucket_clock.advance(delays[-1])
+    assert bucket.reserve() == pytest.approx(0.1)
+
+def test_bucket_needs_at_least_one_token():
+    assert TokenBucket(rate=10, burst=0).capacity == 1
+
+def test_acquire_sleeps_for_the_reserved_delay(bucket_clock):
+    bucket = TokenBucket(rate=4, burst=1)
+    bucket.acquire()
+    bucket.acquire()
+    bucket.acquire()
+    assert bucket_clock.sleeps == pytest.approx([0.25, 0.25])
+
+def test_acquire_async_awaits_the_reserved_delay(bucket_clock, monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(tmdb_client.asyncio, 'sleep', fake_sleep)
+    bucket = TokenBucket(rate=4, burst=1)
+
+    async def acquire_three():
+        for _ in range(3):
+            await bucket.acquire_async()
+
+    asyncio.run(acquire_three())
+    assert slept == pytest.approx([0.25, 0.5])
+
+class StubResponse:
+    def __init__(self, status, payload, headers=None):
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(None, (), status=self.status)
+
+    async def json(self):
+        return self.payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+class StubSession:
+    # Stands in for aiohttp.ClientSession: answers GET /movie/<id> after `gate` opens,
+    # with the next status from `statuses` (200 once they run out)
+    def __init__(self, statuses=()):
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.statuses = list(statuses)
+        self.calls = []
+
+    def get(self, url, params=None):
+        self.calls.append(url.rsplit('/', 1)[-1])
+        return self._respond(url)
+
+    async def _respond_later(self, url):
+        await self.gate.wait()
+        status = self.statuses.pop(0) if self.statuses else 200
+        movie_id = url.rsplit('/', 1)[-1]
+        return StubResponse(status, {'poster_path': f'{movie_id}.jpg', 'overview': f'Movie {movie_id}'})
+
+    def _respond(self, url):
+        session = self
+
+        class Request:
+            async def __aenter__(self):
+                self.response = await session._respond_later(url)
+                return self.response
+
+            async def __aexit__(self, *exc_info):
+                return False
+
+        return Request()
+
+    async def close(self):
+        pass
+
+def stub_client(session, **kwargs):
+    client = AsyncTMDBClient(base_url='http://tmdb.test/3', **kwargs)
+    client.session = session
+    return client
+
+async def settle():
+    # Let every runnable task reach its next await
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_concurrent_lookups_of_one_movie_share_a_request():
+    async def scenario():
+        session = StubSession()
+        session.gate.clear()
+        client = stub_client(session)
+        tasks = [asyncio.ensure_future(client.movie_details(movie_id)) for movie_id in (550, 550, 550, 13)]
+        await settle()
+        assert sorted(session.calls) == ['13', '550']
+        session.gate.set()
+        results = await asyncio.gather(*tasks)
+        return client, session, results
+
+    client, session, results = asyncio.run(scenario())
+    assert [result['overview'] for result in results] == ['Movie 550'] * 3 + ['Movie 13']
+    assert len(session.calls) == 2
+    stats = client.stats()
+    assert (stats['requests'], stats['lookups'], stats['coalesced']) == (2, 4, 2)
+    assert stats['dedup_ratio'] == pytest.approx(0.5)
+    assert client._in_flight == {}
+
+def test_finished_lookups_are_not_reused():
+    # Single flight only joins fetches still running; caching is the caller's job
+    async def scenario():
+        session = StubSession()
+        client = stub_client(session)
+        await client.movie_details(550)
+        await client.movie_details(550)
+        return client, session
+
+    client, session = asyncio.run(scenario())
+    assert session.calls == ['550', '550']
+    assert client.stats()['coalesced'] == 0
+
+def test_cancelled_caller_does_not_cancel_the_shared_fetch():
+    async def scenario():
+        session = StubSession()
+        session.gate.clear()
+        client = stub_client(session)
+        leaving = asyncio.ensure_future(client.movie_details(550))
+        staying = asyncio.ensure_future(client.movie_details(550))
+        await settle()
+        leaving.cancel()
+        await settle()
+        session.gate.set()
+        result = await staying
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return client, session, result
+
+    client, session, result = asyncio.run(scenario())
+    assert result['overview'] == 'Movie 550'
+    assert session.calls == ['550']
+    assert client._in_flight == {}
+
+def test_fetch_abandoned_by_every_caller_still_serves_late_joiners():
+    async def scenario():
+        session = StubSession()
+        session.gate.clear()
+        client = stub_client(session)
+        first = asyncio.ensure_future(client.movie_details(550))
+        await settle()
+        first.cancel()
+        await settle()
+        assert 550 in client._in_flight
+        late = asyncio.ensure_future(client.movie_details(550))
+        await settle()
+        session.gate.set()
+        return client, session, await late
+
+    client, session, result = asyncio.run(scenario())
+    assert result['overview'] == 'Movie 550'
+    assert session.calls == ['550']
+    assert client.stats()['coalesced'] == 1
+
+def test_failure_reaches_every_waiter_and_is_retried_next_time():
+    async def scenario():
+        session = StubSession(statuses=[404])
+        session.gate.clear()
+        client = stub_client(session)
+        tasks = [asyncio.ensure_future(client.movie_details(550)) for _ in range(2)]
+        await settle()
+        session.gate.set()
+        failures = await asyncio.gather(*tasks, return_exceptions=True)
+        retry = await client.movie_details(550)
+        return session, failures, retry
+
+    session, failures, retry = asyncio.run(scenario())
+    assert [failure.status for failure in failures] == [404, 404]
+    assert retry['overview'] == 'Movie 550'
+    assert session.calls == ['550', '550']
+
+def test_many_returns_failures_in_place(monkeypatch):
+    monkeypatch.setattr(tmdb_client, 'RETRY_BACKOFF', 0)
+
+    async def scenario():
+        session = StubSession(statuses=[200, 404])
+        client = stub_client(session, max_retries=0, max_concurrency=1)
+        return await client.movie_details_many([1, 2, 3])
+
+    results = asyncio.run(scenario())
+    assert results[0]['overview'] == 'Movie 1'
+    assert isinstance(results[1], aiohttp.ClientResponseError)
+    assert results[2]['overview'] == 'Movie 3'
+
+def test_retries_spend_rate_limit_tokens(bucket_clock, monkeypatch):
+    monkeypatch.setattr(tmdb_client, 'RETRY_BACKOFF', 0)
+    bucket = TokenBucket(rate=10, burst=10)
+
+    async def scenario():
+        session = StubSession(statuses=[503, 429])
+        client = stub_client(session, rate_limiter=bucket)
+        return client, session, await client.movie_details(550)
+
+    client, session, result = asyncio.run(scenario())
+    assert result['overview'] == 'Movie 550'
+    assert session.calls == ['550'] * 3
+    assert client.stats()['requests'] == 3
+    assert bucket.acquired == 3
+
+def test_connection_stats_count_reused_connections():
+    # A real local server: sequential requests ride one keep-alive connection
+    from aiohttp import web
+
+    async def movie(request):
+        movie_id = request.match_info['movie_id']
+        return web.json_response({'poster_path': f'{movie_id}.jpg', 'overview': f'Movie {movie_id}'})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get('/3/movie/{movie_id}', movie)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        client = AsyncTMDBClient(base_url=f'http://127.0.0.1:{port}/3')
+        try:
+            for movie_id in (1, 2, 3, 4):
+                assert (await client.movie_details(movie_id))['overview'] == f'Movie {movie_id}'
+            return client.stats()
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    stats = asyncio.run(scenario())
+    assert (stats['connections_created'], stats['connections_reused']) == (1, 3)
+    assert stats['reuse_ratio'] == pytest.approx(0.75)
+    assert (stats['active_connections'], stats['idle_connections']) == (0, 1)
+
+def test_connection_stats_before_the_first_request():
+    stats = AsyncTMDBClient().stats()
+    assert stats['connections_created'] == stats['active_connections'] == stats['idle_connections'] == 0
+    assert stats['reuse_ratio'] == 0.0
@@ -0,0 +1,252 @@
+import argparse
+import bisect
+import os
+import random
+import time
+from difflib import SequenceMatcher
+import numpy as np
+
+# Fuzzy title lookup backed by a trigram inverted index. Instead of scoring
+# every title with SequenceMatcher, titles sharing the most trigrams with the
+# query (Dice overlap) are shortlisted and only those get the expensive ratio.
+# A misspelt title keeps most of its trigrams, so the best match is virtually
+# always in the shortlist; `python title_search.py` checks this against the
+# linear scan. Titles whose length alone rules out the threshold are skipped.
+Q = 3
+FUZZY_THRESHOLD = 0.8
+SHORTLIST_SIZE = 32
+
+def trigrams(text):
+    # Padded so short titles and word boundaries still produce trigrams
+    text = f" {text} "
+    return [text[i:i + Q] for i in range(len(text) - Q + 1)]
+
+class TitleSearchIndex:
+    def __init__(self, titles):
+        # `titles` are normalised (lowercased) titles in lookup order; ties are
+        # resolved in favour of the earlier title, like the linear scan
+        self.titles = list(titles)
+        lengths = np.array([len(title) for title in self.titles], dtype=np.int32)
+
+        # Titles are numbered internally by length, so the lengths that can still
+        # reach the threshold form one contiguous id range and every posting list
+        # can be cut down to it with a binary search
+        self.order = np.argsort(lengths, kind='stable').astype(np.int32)
+        self.lengths = lengths[self.order]
+        postings = {}
+        for internal_id, position in enumerate(self.order):
+            for gram in set(trigrams(self.titles[position])):
+                postings.setdefault(gram, []).append(internal_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.titles)
+
+    def shortlist(self, query, threshold=FUZZY_THRESHOLD, size=SHORTLIST_SIZE):
+        # SequenceMatcher.ratio() can't exceed 2 * min(la, lb) / (la + lb), which
+        # confines lb to (threshold * la / (2 - threshold), la * (2 - threshold) / threshold)
+        la = len(query)
+        lo = np.searchsorted(self.lengths, threshold * la / (2 - threshold), side='right')
+        hi = np.searchsorted(self.lengths, la * (2 - threshold) / threshold, side='left')
+        if lo >= hi:
+            return np.empty(0, dtype=np.int64)
+
+        grams = set(trigrams(query))
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        ids = np.concatenate(lists)
+        counts = np.bincount(ids[(ids >= lo) & (ids < hi)] - lo, minlength=hi - lo)
+
+        # Titles sharing under half the trigrams of the best-overlapping one are not worth scoring
+        internal = np.flatnonzero(counts >= max(1, counts.max() // 2))
+        # With padding a title of length n has exactly n trigrams
+        dice = 2 * counts[internal] / (len(grams) + np.maximum(self.lengths[lo + internal], 1))
+        if len(internal) > size:
+            top = np.argpartition(-dice, size)[:size]
+            internal, dice = internal[top], dice[top]
+        positions = self.order[lo + internal]
+        return positions[np.lexsort((positions, -dice))]
+
+    def best_match(self, query, threshold=FUZZY_THRESHOLD):
+        best_position = None
+        best_score = threshold
+        for position in self.shortlist(query, threshold):
+            matcher = SequenceMatcher(None, query, self.titles[position])
+            if matcher.quick_ratio() < best_score:
+                continue
+            score = matcher.ratio()
+            if score > best_score or (score == best_score and best_position is not None and position < best_position):
+                best_score = score
+                best_position = position
+        if best_position is None:
+            return None, 0
+        return self.titles[best_position], best_score
+
+# Prefix autocomplete over every word start of every title, so "dark kn"
+# finds "The Dark Knight". Keys are kept in one sorted list; a prefix is a
+# contiguous bisect range. A title equal to the typed text comes first, then
+# titles that start with it, then titles with a later word matching it, each
+# group best-ranked first. Results for prefixes matching many keys (e.g.
+# "the") are precomputed, so every lookup touches at most CACHE_MIN_RANGE keys.
+AUTOCOMPLETE_LIMIT = 20
+CACHE_MIN_RANGE = 512
+
+class TitleAutocomplete:
+    def __init__(self, titles, scores=None, limit=AUTOCOMPLETE_LIMIT):
+        # `titles` are the display titles; `scores` (e.g. popularity or vote
+        # count, higher is better) decide the order, defaulting to catalog order
+        self.titles = list(titles)
+        self.limit = limit
+        n = len(self.titles)
+        if scores is None:
+            self.by_rank = np.arange(n, dtype=np.int32)
+        else:
+            self.by_rank = np.argsort(-np.asarray(scores, dtype=np.float64), kind='stable').astype(np.int32)
+        rank_of = np.empty_like(self.by_rank)
+        rank_of[self.by_rank] = np.arange(n, dtype=np.int32)
+
+        entries = []
+        # Lowercased title -> its titles, best-ranked first, so an exact match can lead
+        self.exact = {}
+        for position in self.by_rank:
+            self.exact.setdefault(self.titles[position].lower(), []).append(self.titles[position])
+        for position, title in enumerate(self.titles):
+            normalised = title.lower()
+            starts = [0] + [i + 1 for i, char in enumerate(normalised) if char == ' ']
+            for start in dict.fromkeys(starts):
+                if start < len(normalised):
+                    # Later-word matches sort after every whole-title match
+                    entries.append((normalised[start:], int(rank_of[position]) + (n if start else 0)))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ranks = np.array([rank for _, rank in entries], dtype=np.int64)
+
+        self.cache = {}
+        frontier = ['']
+        while frontier:
+            children = set()
+            for prefix in frontier:
+                lo, hi = self._range(prefix)
+                if hi - lo <= CACHE_MIN_RANGE:
+                    continue
+                if prefix:
+                    self.cache[prefix] = self._collect(lo, hi, limit)
+                children.update(key[:len(prefix) + 1] for key in self.keys[lo:hi] if len(key) > len(prefix))
+            frontier = children
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _range(self, prefix):
+        lo = bisect.bisect_left(self.keys, prefix)
+        return lo, bisect.bisect_left(self.keys, prefix + '\uffff', lo)
+
+    def _collect(self, lo, hi, limit):
+        # np.unique sorts, so titles come out in tier-then-rank order
+        n = len(self.titles)
+        positions = []
+        for rank in np.unique(self.ranks[lo:hi]):
+            position = self.by_rank[rank % n]
+            if position not in positions:
+                positions.append(position)
+                if len(positions) == limit:
+                    break
+        return [self.titles[position] for position in positions]
+
+    def complete(self, prefix, limit=None):
+        limit = limit or self.limit
+        prefix = prefix.lower().strip()
+        if not prefix:
+            return [self.titles[position] for position in self.by_rank[:limit]]
+        if prefix in self.cache and limit <= self.limit:
+            results = self.cache[prefix][:limit]
+        else:
+            results = self._collect(*self._range(prefix), limit)
+        exact = self.exact.get(prefix)
+        if exact:
+            results = (exact + [title for title in results if title.lower() != prefix])[:limit]
+        return results
+
+def linear_best_match(query, titles, threshold=FUZZY_THRESHOLD):
+    # Reference implementation: the scan find_movie_index used to do
+    best_match = None
+    best_score = threshold
+    for title in titles:
+        score = SequenceMatcher(None, query, title).ratio()
+        if score > best_score:
+            best_score = score
+            best_match = title
+    return best_match, best_score if best_match else 0
+
+def misspell(title, rng):
+    # One random typo: drop, duplicate or swap a character
+    if len(title) < 2:
+        return title
+    i = rng.randrange(len(title) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return title[:i] + title[i + 1:]
+    if kind == 1:
+        return title[:i] + title[i] + title[i:]
+    return title[:i] + title[i + 1] + title[i] + title[i + 2:]
+
+def synthetic_titles(titles, n, seed=0):
+    # Plausible extra titles made by recombining words from real ones
+    rng = random.Random(seed)
+    words = [word for title in titles for word in title.split()]
+    result = list(dict.fromkeys(titles))
+    seen = set(result)
+    while len(result) < n:
+        title = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 5)))
+        if title not in seen:
+            seen.add(title)
+            result.append(title)
+    return result
+
+def benchmark(titles, n_queries=200, seed=0):
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    index = TitleSearchIndex(titles)
+    build_seconds = time.perf_counter() - start
+
+    queries = [misspell(rng.choice(titles), rng) for _ in range(n_queries)]
+    start = time.perf_counter()
+    indexed = [index.best_match(query) for query in queries]
+    index_ms = 1000 * (time.perf_counter() - start) / n_queries
+
+    # The linear scan is slow at large sizes, so it only runs on a subset
+    scan_queries = queries[:max(1, min(n_queries, 2_000_000 // max(len(titles), 1)))]
+    start = time.perf_counter()
+    scanned = [linear_best_match(query, titles) for query in scan_queries]
+    scan_ms = 1000 * (time.perf_counter() - start) / len(scan_queries)
+
+    mismatches = sum(1 for a, b in zip(indexed, scanned) if a[0] != b[0])
+    return {
+        'titles': len(titles),
+        'build_seconds': build_seconds,
+        'index_ms': index_ms,
+        'scan_ms': scan_ms,
+        'compared': len(scan_queries),
+        'mismatches': mismatches,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the trigram title index against the linear scan")
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--sizes', type=int, nargs='*', default=[100000])
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    from build_artifacts import load_pickle
+    movies = load_pickle(os.path.join(args.data_dir, 'movies.pkl'))
+    titles = list(dict.fromkeys(title.lower() for title in movies['title']))
+
+    print(f"{'titles':>8} {'build (s)':>10} {'index (ms)':>11} {'scan (ms)':>10} {'compared':>9} {'mismatches':>11}")
+    for size in [len(titles)] + args.sizes:
+        result = benchmark(synthetic_titles(titles, size), n_queries=args.queries)
+        print(f"{result['titles']:>8} {result['build_seconds']:>10.2f} {result['index_ms']:>11.3f} "
+              f"{result['scan_ms']:>10.2f} {result['compared']:>9} {result['mismatches']:>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+import argparse
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import threading
+import time
+import aiohttp
+
+# One shared HTTP client for every TMDB call. A single aiohttp session with a
+# sized connection pool keeps connections to api.themoviedb.org alive, so only
+# the first requests pay for TCP + TLS handshakes.
+TMDB_API_URL = os.environ.get('TMDB_API_URL', "https://api.themoviedb.org/3")
+TMDB_API_KEY = os.environ.get('TMDB_API_KEY', '3d05f117126e1e8778d85a868b27b363')
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+POOL_SIZE = int(os.environ.get('TMDB_POOL_SIZE', 16))
+CONNECT_TIMEOUT = float(os.environ.get('TMDB_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.environ.get('TMDB_READ_TIMEOUT', 10))
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1  # seconds
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Requests in flight at once on the async client, across every caller
+MAX_CONCURRENCY = int(os.environ.get('TMDB_MAX_CONCURRENCY', POOL_SIZE))
+# Outbound request budget shared by every client in the process, kept under
+# TMDB's ~50 requests/second so we slow down before being throttled; 0 or
+# less turns the limit off
+RATE_LIMIT = float(os.environ.get('TMDB_RATE_LIMIT', 40))  # requests per second
+RATE_BURST = int(os.environ.get('TMDB_RATE_BURST', 20))
+
+class TokenBucket:
+    # Thread-safe token bucket usable from threads and coroutines alike. Each
+    # request reserves a token up front; when the bucket is empty the balance
+    # goes negative and the caller waits until its token has been refilled,
+    # so queued requests leave evenly spaced at `rate` per second. A rate of
+    # 0 or less never delays anyone.
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.delayed = 0
+        self.waited = 0.0
+
+    def reserve(self):
+        # Take a token and return how long the caller has to wait for it
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.acquired += 1
+            if self.rate <= 0:
+                return 0.0
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            if delay > 0:
+                self.delayed += 1
+                self.waited += delay
+            return delay
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            'rate_limit': self.rate,
+            'throttled_requests': self.delayed,
+            'throttle_wait_seconds': self.waited,
+        }
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    # The process-wide bucket shared by the module-level client, or None when
+    # TMDB_RATE_LIMIT turns the limit off
+    global _rate_limiter
+    if RATE_LIMIT <= 0:
+        return None
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = TokenBucket()
+    return _rate_limiter
+
+# Credits and videos ride along on the movie request, so a movie costs one call
+DETAILS_APPEND = 'credits,videos'
+
+def format_movie_details(movie_id, data, credits_data=None, videos_data=None):
+    # Turn a TMDB movie payload into the dict the UI renders. Credits and videos
+    # default to the sections appended to it by append_to_response.
+    credits_data = data.get('credits', {}) if credits_data is None else credits_data
+    videos_data = data.get('videos', {}) if videos_data is None else videos_data
+    budget = data.get('budget', 0)
+    revenue = data.get('revenue', 0)
+    formatted_budget = f"${budget:,}" if budget > 0 else "Not available"
+    formatted_revenue = f"${revenue:,}" if revenue > 0 else "Not available"
+
+    # Find the best trailer
+    trailer_key = None
+    if 'results' in videos_data:
+        for video in videos_data['results']:
+            if video['type'] == 'Trailer' and video['site'] == 'YouTube' and video.get('official', False):
+                trailer_key = video['key']
+                break
+
+        if not trailer_key:
+            for video in videos_data['results']:
+                if video['type'] == 'Trailer' and video['site'] == 'YouTube':
+                    trailer_key = video['key']
+                    break
+
+    # Get main cast (first 3)
+    main_cast = []
+    if 'cast' in credits_data:
+        for actor in credits_data['cast'][:3]:
+            main_cast.append({
+                'name': actor['name'],
+                'character': actor['character'],
+                'profile_path': f"https://image.tmdb.org/t/p/w200/{actor['profile_path']}" if actor.get('profile_path') else None
+            })
+
+    return {
+        'poster': "https://image.tmdb.org/t/p/w500/" + data['poster_path'] if data.get('poster_path') else None,
+        'overview': data.get('overview', 'No description available'),
+        'release_date': data.get('release_date', 'N/A'),
+        'vote_average': data.get('vote_average', 'N/A'),
+        'tmdb_url': f"https://www.themoviedb.org/movie/{movie_id}",
+        'trailer_key': trailer_key,
+        'budget': formatted_budget,
+        'revenue': formatted_revenue,
+        'runtime': f"{data.get('runtime', 0)} minutes" if data.get('runtime') else "Not available",
+        'genres': [genre['name'] for genre in data.get('genres', [])],
+        'main_cast': main_cast
+    }
+
+# The TMDB client, built to hydrate many movies at once. Every request runs
+# as a coroutine on one event loop (a daemon thread shared by all Streamlit
+# sessions), so fetching 11 movies x 3 endpoints costs no threads at all and
+# a semaphore caps how many requests are in flight across all users.
+class AsyncTMDBClient:
+    def __init__(self, api_key=TMDB_API_KEY, base_url=TMDB_API_URL, pool_size=POOL_SIZE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 max_concurrency=MAX_CONCURRENCY, rate_limiter=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limiter = rate_limiter
+        self.session = None
+        self._requests = 0
+        # Single flight: concurrent lookups of the same movie share one fetch
+        self._in_flight = {}
+        self._lookups = 0
+        self._coalesced = 0
+        # Connection pool usage: a request either opens a connection (paying the
+        # handshake) or reuses an idle one, as reported by aiohttp's tracing hooks
+        self.connector = None
+        self._connections_created = 0
+        self._connections_reused = 0
+
+    def _session(self):
+        # Created on first use so it belongs to the loop that runs the requests
+        if self.session is None:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+            self.connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(
+                headers={'User-Agent': USER_AGENT},
+                timeout=self.timeout,
+                connector=self.connector,
+                trace_configs=[trace_config],
+            )
+        return self.session
+
+    async def _on_connection_created(self, session, context, params):
+        self._connections_created += 1
+
+    async def _on_connection_reused(self, session, context, params):
+        self._connections_reused += 1
+
+    async def get_json(self, path, **params):
+        params = {'api_key': self.api_key, **params}
+        for attempt in range(self.max_retries + 1):
+            backoff = RETRY_BACKOFF * 2 ** attempt
+            # Retries spend tokens too; the wait happens before taking a connection slot
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            try:
+                async with self.semaphore:
+                    self._requests += 1
+                    async with self._session().get(f"{self.base_url}{path}", params=params) as response:
+                        if response.status not in RETRY_STATUSES or attempt == self.max_retries:
+                            response.raise_for_status()
+                            return await response.json()
+                        retry_after = response.headers.get('Retry-After', '')
+                        if retry_after.isdigit():
+                            backoff = max(backoff, int(retry_after))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+            # Exponential backoff, or the server's Retry-After when it is longer
+            await asyncio.sleep(backoff)
+
+    async def _fetch_details(self, movie_id):
+        data = await self.get_json(f"/movie/{movie_id}", language='en-US', append_to_response=DETAILS_APPEND)
+        return format_movie_details(movie_id, data)
+
+    async def movie_details(self, movie_id):
+        self._lookups += 1
+        task = self._in_flight.get(movie_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_details(movie_id))
+            self._in_flight[movie_id] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(movie_id, None))
+        else:
+            self._coalesced += 1
+        # Shielded so one caller giving up doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def movie_details_many(self, movie_ids):
+        # One entry per id, in order; failures come back as the exception
+        return await asyncio.gather(*(self.movie_details(movie_id) for movie_id in movie_ids),
+                                    return_exceptions=True)
+
+    def stats(self):
+        stats = {
+            'requests': self._requests,
+            'lookups': self._lookups,
+            'coalesced': self._coalesced,
+            'dedup_ratio': self._coalesced / self._lookups if self._lookups else 0.0,
+        }
+        stats.update(self.connection_stats())
+        if self.rate_limiter is not None:
+            stats.update(self.rate_limiter.stats())
+        return stats
+
+    def connection_stats(self):
+        # aiohttp has no public pool counters: checked-out connections sit in the
+        # connector's acquired set and idle keep-alive ones in its per-host lists
+        connector = self.connector
+        connections = self._connections_created + self._connections_reused
+        return {
+            'connections_created': self._connections_created,
+            'connections_reused': self._connections_reused,
+            'active_connections': len(getattr(connector, '_acquired', ())),
+            'idle_connections': sum(len(conns) for conns in getattr(connector, '_conns', {}).values()),
+            'reuse_ratio': self._connections_reused / connections if connections else 0.0,
+        }
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+_loop = None
+_async_client = None
+_loop_lock = threading.Lock()
+_client_lock = threading.Lock()
+
+def _get_loop():
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='tmdb-event-loop', daemon=True).start()
+                _loop = loop
+    return _loop
+
+def run_async(coroutine, timeout=None):
+    # Sync entry point: run a coroutine on the shared loop and wait for its result
+    return asyncio.run_coroutine_threadsafe(coroutine, _get_loop()).result(timeout)
+
+def get_async_client():
+    # Module-level async client; it belongs to the shared loop, so only use it through run_async
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncTMDBClient(rate_limiter=get_rate_limiter())
+                atexit.register(lambda: run_async(_async_client.close()))
+    return _async_client
+
+def fetch_movie_details_many(movie_ids, client=None, timeout=None):
+    # Details for every movie id fetched concurrently; failed ids yield the exception
+    client = client or get_async_client()
+    return run_async(client.movie_details_many(list(movie_ids)), timeout)
+
+def iter_movie_details_many(movie_ids, client=None):
+    # Like fetch_movie_details_many, but yields (position, details or exception)
+    # as soon as each movie arrives, so callers can show it right away
+    client = client or get_async_client()
+    loop = _get_loop()
+    futures = {asyncio.run_coroutine_threadsafe(client.movie_details(movie_id), loop): position
+               for position, movie_id in enumerate(movie_ids)}
+    for future in concurrent.futures.as_completed(futures):
+        error = future.exception()
+        yield futures[future], error if error is not None else future.result()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch TMDB movie details concurrently and report connection reuse")
+    parser.add_argument('movie_ids', type=int, nargs='+')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--base-url', default=None, help="Point at another server (e.g. a local stub)")
+    parser.add_argument('--rate', type=float, default=RATE_LIMIT,
+                        help="Requests per second for --base-url clients (0 for unlimited)")
+    args = parser.parse_args()
+    rate_limiter = TokenBucket(args.rate) if args.rate > 0 else None
+
+    client = AsyncTMDBClient(base_url=args.base_url, rate_limiter=rate_limiter) if args.base_url else get_async_client()
+    start = time.perf_counter()
+    # Rounds run one after another, so later ones can reuse the first round's connections
+    results = []
+    for _ in range(args.repeat):
+        results.extend(fetch_movie_details_many(args.movie_ids, client=client))
+    elapsed = time.perf_counter() - start
+    failures = sum(1 for result in results if isinstance(result, Exception))
+    stats = client.stats()
+    run_async(client.close())
+    print(f"{len(results)} movies in {elapsed:.2f}s ({failures} failed) on {threading.active_count()} threads")
+    for name, value in stats.items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
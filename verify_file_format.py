@@ -1,74 +1,59 @@
+import argparse
 import os
-import pickle
-import joblib
-import numpy as np
-import pandas as pd
+import sys
+import time
+import zlib
+from artifact_bundle import BUNDLE_FILE, SCHEMA_VERSION, BundleError, check_recommender_bundle, open_bundle
 
-def verify_file(file_path):
+# Checks recommender.bundle against its manifest: schema version, every
+# array's dtype, shape, bounds and CRC-32, and that the arrays agree with each
+# other (row counts, offsets, neighbor ids). Exits non-zero if anything fails.
+
+def verify_bundle(file_path):
     print(f"\nVerifying {file_path}")
     if not os.path.exists(file_path):
-        print("File does not exist")
-        return False
-        
-    # Get file size
-    file_size = os.path.getsize(file_path)
-    print(f"File size: {file_size} bytes")
-    
-    # Try to read as binary first
-    try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
-        print("Successfully read as binary")
-    except Exception as e:
-        print(f"Error reading as binary: {str(e)}")
+        print("File does not exist; build it with: python build_artifacts.py")
         return False
-        
-    # Try different loading methods
-    methods = {
-        'joblib': lambda: joblib.load(file_path),
-        'pickle': lambda: pickle.load(open(file_path, 'rb')),
-        'numpy': lambda: np.load(file_path, allow_pickle=True)
-    }
-    
-    for method_name, load_func in methods.items():
-        try:
-            data = load_func()
-            print(f"Successfully loaded with {method_name}")
-            print(f"Data type: {type(data)}")
-            if isinstance(data, (pd.DataFrame, np.ndarray)):
-                print(f"Shape: {data.shape}")
-            return True
-        except Exception as e:
-            print(f"Failed to load with {method_name}: {str(e)}")
-            
-    return False
+    print(f"File size: {os.path.getsize(file_path)} bytes")
 
-def fix_file_format(file_path):
+    start = time.perf_counter()
     try:
-        # First try to load with pickle
-        with open(file_path, 'rb') as f:
-            data = pickle.load(f)
-            
-        # Save with joblib
-        joblib.dump(data, file_path)
-        print(f"Successfully converted {file_path} to joblib format")
-        return True
-    except Exception as e:
-        print(f"Error converting {file_path}: {str(e)}")
+        # Header, manifest, dtypes, shapes and bounds; checksums are reported per array below
+        bundle = open_bundle(file_path, verify=False)
+    except (OSError, BundleError) as e:
+        print(f"Invalid bundle: {str(e)}")
         return False
+    opened = time.perf_counter() - start
+
+    manifest = bundle.manifest
+    created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(manifest.get('created', 0)))
+    print(f"Schema version: {manifest['schema_version']} (expected {SCHEMA_VERSION}), created {created}")
+    for name, value in bundle.metadata.items():
+        print(f"  {name}: {value}")
+
+    ok = True
+    for name, entry in manifest['arrays'].items():
+        array = bundle[name]
+        checksum_ok = zlib.crc32(memoryview(array).cast('B') if array.size else b'') == entry['crc32']
+        ok = ok and checksum_ok
+        print(f"  {name:<24} {array.dtype.str:<5} {str(array.shape):<16} {array.nbytes:>10} bytes  "
+              f"crc32 {entry['crc32']:08x} {'OK' if checksum_ok else 'MISMATCH'}")
+
+    problems = check_recommender_bundle(bundle)
+    for problem in problems:
+        print(f"Problem: {problem}")
+    ok = ok and not problems
+    print(f"Opened in {opened * 1000:.1f} ms; {'bundle is valid' if ok else 'bundle is NOT usable'}")
+    return ok
 
 def main():
-    files_to_check = ['movies.pkl', 'movie_list.pkl', 'similarity.pkl']
-    base_dir = '/mount/src/movie-recommendation'
-    
-    for file in files_to_check:
-        file_path = os.path.join(base_dir, file)
-        if not verify_file(file_path):
-            print(f"\nAttempting to fix {file_path}")
-            if fix_file_format(file_path):
-                print("Successfully fixed file format")
-            else:
-                print("Failed to fix file format")
+    parser = argparse.ArgumentParser(description="Verify the recommender artifact bundle against its manifest")
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--path', default=None, help=f"Bundle file (default: <data-dir>/{BUNDLE_FILE})")
+    args = parser.parse_args()
+
+    if not verify_bundle(args.path or os.path.join(args.data_dir, BUNDLE_FILE)):
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
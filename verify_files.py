@@ -7,7 +7,7 @@ def verify_files():
     print(f"Current directory: {current_dir}")
     
     # List of required files
-    required_files = ['movies.pkl', 'movie_list.pkl', 'similarity.pkl', 'app.py']
+    required_files = ['recommender.bundle', 'movies.pkl', 'movie_list.pkl', 'similarity.pkl', 'similarity.npy', 'app.py']
     
     # Check each file
     for file in required_files: